@@ -1 +1,3 @@
 from .main import main as calculate_attack_teams
+from .main import get_all_player_units_async
+from .incremental import IncrementalRound
@@ -6,17 +6,25 @@ import typer
 
 from get_data import run as scrape_data
 from create_data import run as create_data
+from benchmark import run as benchmark_parsers
 
 
 app = typer.Typer(help="GAC CLI data management")
 
 
 @app.command()
-def scrape():
+def scrape(
+    concurrency: int = typer.Option(None, help="Teams scraped at the same time."),
+    rate: float = typer.Option(None, help="Maximum requests per second."),
+    resume: bool = typer.Option(True, help="Skip the teams a failed run scraped."),
+    refresh: bool = typer.Option(
+        False, help="Scrape the latest scraped season again, only the changed pages."
+    ),
+):
     """
     Scrape the data from the web.
     """
-    scrape_data()
+    scrape_data(concurrency=concurrency, rate=rate, resume=resume, refresh=refresh)
 
 
 @app.command()
@@ -27,5 +35,16 @@ def create():
     create_data()
 
 
+@app.command()
+def benchmark(
+    pages: list[str] = typer.Argument(..., help="Saved counter pages, by leader."),
+    repeat: int = typer.Option(5, help="Times the pages are parsed."),
+):
+    """
+    Compare the counter page parsers on saved pages.
+    """
+    benchmark_parsers(pages, repeat=repeat)
+
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,120 @@
+"""
+Micro-benchmark of the counter page parsers
+
+Compares the soup parser, `parse_counters` and `next_page_url`, with the
+streaming `parse_page`, on counter pages saved as HTML files, eg. with
+
+    curl -o DARTHTRAYA.html "https://swgoh.gg/gac/counters/DARTHTRAYA/?season_id=..."
+
+The name of each file is used as the leader. Both parsers must give the
+same counters and next page, a page where they differ is logged. There
+are a few saved pages in tests/fixtures/counters, some with broken markup.
+"""
+
+from bs4 import BeautifulSoup
+from printinglog import Logger
+from scraper import next_page_url, parse_counters, parse_page
+import os
+import time
+
+logger = Logger(format="simple")
+
+
+def parse_soup(content: bytes, leader: str) -> tuple[list[dict], str | None]:
+    """
+    Get the counters and the next page with the soup parser
+
+    Parameters:
+    ----------
+    content: bytes
+        HTML of the page
+
+    leader: str
+        Leader of the team
+
+    Returns:
+    -------
+    counters: list[dict]
+        List of counters on the page
+
+    next_url: str | None
+        URL of the next page, or None if it's the last page
+    """
+    soup = BeautifulSoup(content, "html.parser")
+    return parse_counters(soup, leader), next_page_url(soup)
+
+
+def time_parser(parser, pages: dict[str, bytes], repeat: int) -> float:
+    """
+    Get the best time of the parser over all the pages
+
+    Parameters:
+    ----------
+    parser: Callable[[bytes, str], tuple[list[dict], str | None]]
+        The parser, called with the content and the leader
+
+    pages: dict[str, bytes]
+        The content of each page, by the leader
+
+    repeat: int
+        Number of times all the pages are parsed
+
+    Returns:
+    -------
+    seconds: float
+        The fastest time to parse all the pages
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for leader, content in pages.items():
+            parser(content, leader)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(paths: list[str], repeat: int = 5) -> dict:
+    """
+    Compare the parsers on the saved pages
+
+    Parameters:
+    ----------
+    paths: list[str]
+        Paths to the saved counter pages
+
+    repeat: int
+        Number of times all the pages are parsed, the best time is used
+
+    Returns:
+    -------
+    result: dict
+        The "soup" and "stream" time of each page in milliseconds, the
+        number of "counters" and the pages that are "different"
+    """
+    pages: dict[str, bytes] = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            pages[os.path.splitext(os.path.basename(path))[0]] = f.read()
+
+    counters = 0
+    different = []
+    for leader, content in pages.items():
+        expected = parse_soup(content, leader)
+        counters += len(expected[0])
+        if parse_page(content, leader) != expected:
+            different.append(leader)
+            logger.warning(f"The parsers don't give the same result for {leader}")
+
+    soup = time_parser(parse_soup, pages, repeat) * 1000 / len(pages)
+    stream = time_parser(parse_page, pages, repeat) * 1000 / len(pages)
+    logger.info(
+        f"{len(pages)} pages, {counters} counters:"
+        f" soup {soup:.2f} ms, stream {stream:.2f} ms per page,"
+        f" {soup / stream:.1f}x faster"
+    )
+    return {
+        "soup": soup,
+        "stream": stream,
+        "counters": counters,
+        "different": different,
+    }
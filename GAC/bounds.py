@@ -0,0 +1,272 @@
+"""
+# Upper bounds for branch and bound
+
+The solver prunes a path when the total win rate of the assignment plus
+an upper bound for the teams left can't beat the best solution found.
+The bound has to be admissible, it can never be lower than what the teams
+left can actually get, otherwise the best solution could be pruned.
+
+### sum:
+    The best legal counter of every team left. Cheap, but it ignores
+    that the teams share units, so the same GL can be counted once for
+    every team it counters.
+
+### matching:
+    Every counter is relaxed to only use its key unit, the unit that is
+    used by the most counters, which is the GL for most GL counters. Each
+    team gets at most one counter and each key unit can only be used once,
+    so the bound is a maximum weight matching between the teams and the
+    key units. Dropping units can only make the teams get more, so it is
+    still admissible. A counter without units has a key of its own.
+
+All bounds are computed on the legal values of the teams left, with the
+scores of `BitmaskCSP`. A bound only needs a `name`, a `prepare` method
+that is called once when the solver is created and an `estimate` method.
+
+"""
+
+
+class SumBound:
+    """
+    The sum of the best legal counter of every team left.
+    """
+
+    name = "sum"
+
+    def prepare(self, csp):
+        """
+        Prepare the bound for the solver.
+
+        Parameters
+        ----------
+        csp : BitmaskCSP
+            The solver using the bound.
+        """
+
+    def estimate(self, csp, depth: int, used: int) -> int:
+        """
+        Estimate the best score the teams left can get.
+
+        Parameters
+        ----------
+        csp : BitmaskCSP
+            The solver using the bound.
+        depth : int
+            The position in `csp.order` of the first team left.
+        used : int
+            The mask with all units used by the assignment.
+
+        Returns
+        -------
+        int
+            An upper bound for the score of the teams left.
+        """
+        if csp.forward_checking:
+            return csp.remaining_best
+        return csp.remaining[depth]
+
+
+class MatchingBound:
+    """
+    The key unit relaxation solved as a maximum weight matching.
+
+    Attributes
+    ----------
+    key_values : dict[int, dict[int, int]]
+        The values of each key unit as a bitset, for each variable.
+    """
+
+    name = "matching"
+
+    def prepare(self, csp):
+        """
+        Find the key unit of every value, the unit of the counter that
+        is used by the most counters in all domains.
+
+        Parameters
+        ----------
+        csp : BitmaskCSP
+            The solver using the bound.
+        """
+        # How many values use each unit
+        uses: dict[int, int] = {}
+        for var in csp.variables:
+            for units in csp.value_units[var]:
+                for unit in units:
+                    uses[unit] = uses.get(unit, 0) + 1
+
+        self.key_values: dict[int, dict[int, int]] = {}
+        for var in csp.variables:
+            key_values: dict[int, int] = {}
+            for position, units in enumerate(csp.value_units[var]):
+                if units:
+                    key = max(units, key=lambda unit: (uses[unit], -unit))
+                else:
+                    # A counter without units, eg. a card with an empty
+                    # attack, shares no unit, so it gets a key of its own
+                    key = -1 - var
+                key_values[key] = key_values.get(key, 0) | 1 << position
+            self.key_values[var] = key_values
+
+    def edges(self, csp, depth: int, used: int) -> dict[int, dict[int, int]]:
+        """
+        The best legal score of each key unit, for each team left.
+
+        Parameters
+        ----------
+        csp : BitmaskCSP
+            The solver using the bound.
+        depth : int
+            The position in `csp.order` of the first team left.
+        used : int
+            The mask with all units used by the assignment.
+
+        Returns
+        -------
+        dict[int, dict[int, int]]
+            The best score for each key unit, for each team left.
+        """
+        edges = {}
+        for var in csp.order[depth:]:
+            live = csp.legal_values(var, used)
+            if not live:
+                continue
+            edges[var] = {
+                key: csp.best_live_score(var, live & values)
+                for key, values in self.key_values[var].items()
+                if live & values
+            }
+        return edges
+
+    def estimate(self, csp, depth: int, used: int) -> int:
+        """
+        Estimate the best score the teams left can get.
+
+        Parameters
+        ----------
+        csp : BitmaskCSP
+            The solver using the bound.
+        depth : int
+            The position in `csp.order` of the first team left.
+        used : int
+            The mask with all units used by the assignment.
+
+        Returns
+        -------
+        int
+            An upper bound for the score of the teams left.
+        """
+        return key_unit_matching(self.edges(csp, depth, used))
+
+
+def key_unit_matching(edges: dict) -> int:
+    """
+    The maximum weight matching between the teams and the key units.
+
+    Key units that only one team can use are not contested, so they
+    are merged into a private column for that team before matching.
+
+    Parameters
+    ----------
+    edges : dict
+        The best score for each key unit, for each team.
+
+    Returns
+    -------
+    int
+        The total score of the matching.
+    """
+    if not edges:
+        return 0
+
+    teams: dict = {}
+    for keys in edges.values():
+        for key in keys:
+            teams[key] = teams.get(key, 0) + 1
+    contested = [key for key, count in teams.items() if count > 1]
+    column = {key: i for i, key in enumerate(contested)}
+
+    rows = list(edges.values())
+    weights = []
+    for i, keys in enumerate(rows):
+        row = [0] * (len(contested) + len(rows))
+        private = 0
+        for key, value_score in keys.items():
+            if key in column:
+                row[column[key]] = value_score
+            elif value_score > private:
+                private = value_score
+        row[len(contested) + i] = private
+        weights.append(row)
+
+    return max_weight_matching(weights)
+
+
+def max_weight_matching(weights: list[list[int]]) -> int:
+    """
+    The weight of the maximum weight matching, with the Hungarian algorithm.
+
+    Parameters
+    ----------
+    weights : list[list[int]]
+        The weight of each row and column, with at least as many
+        columns as rows. All weights are zero or more.
+
+    Returns
+    -------
+    int
+        The total weight of the matching.
+    """
+    rows, columns = len(weights), len(weights[0])
+    infinity = float("inf")
+    # Potentials, and the row matched to each column (1-indexed, 0 is none)
+    u = [0] * (rows + 1)
+    v = [0] * (columns + 1)
+    match = [0] * (columns + 1)
+    way = [0] * (columns + 1)
+
+    for row in range(1, rows + 1):
+        match[0] = row
+        j0 = 0
+        minv = [infinity] * (columns + 1)
+        visited = [False] * (columns + 1)
+        while True:
+            visited[j0] = True
+            i0 = match[j0]
+            weights_i0 = weights[i0 - 1]
+            delta = infinity
+            j1 = 0
+            for j in range(1, columns + 1):
+                if not visited[j]:
+                    # Minimize the negated weights
+                    cur = -weights_i0[j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(columns + 1):
+                if visited[j]:
+                    u[match[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if match[j0] == 0:
+                break
+        # Flip the augmenting path
+        while j0:
+            j1 = way[j0]
+            match[j0] = match[j1]
+            j0 = j1
+
+    return sum(
+        weights[match[j] - 1][j - 1] for j in range(1, columns + 1) if match[j]
+    )
+
+
+BOUNDS = {
+    "sum": SumBound,
+    "matching": MatchingBound,
+}
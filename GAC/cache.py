@@ -0,0 +1,186 @@
+"""
+# Solution cache
+
+Players send the same GAC round many times while the round goes on, with
+small edits like an eliminated team or a used attack. The solutions are
+cached with a key from the parts of the round the solver depends on, so
+the same round is not solved again.
+
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+import time
+
+
+class TTLCache:
+    """
+    A least recently used cache, where each entry expires after a time.
+
+    Attributes
+    ----------
+    maxsize : int
+        The maximum number of entries, the least recently used entry is
+        removed when the cache is full.
+    ttl : float
+        The number of seconds an entry is valid.
+    hits : int
+        The number of lookups that found an entry.
+    misses : int
+        The number of lookups that found no entry, or an expired one.
+
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 600):
+        """
+        Constructs all the necessary attributes for the TTLCache object.
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            The maximum number of entries, by default 128.
+        ttl : float, optional
+            The number of seconds an entry is valid, by default 600.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str, default=None):
+        """
+        Get the value of a key, if it exists and hasn't expired.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry.
+        default : optional
+            The value to return if there is no entry, by default None.
+
+        Returns
+        -------
+        object
+            The value of the entry, or the default.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value):
+        """
+        Set the value of a key, and remove the least recently used
+        entry if the cache is full.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry.
+        value : object
+            The value of the entry.
+        """
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all the entries.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def round_fingerprint(
+    mode: str,
+    min_gear_level: int,
+    available_units: list[str],
+    opponent: dict,
+    focus_zone: list[str],
+    solver: str = "bitmask",
+    data_version: float | None = None,
+    exact: bool = True,
+    max_values: int | None = None,
+) -> str:
+    """
+    A key for the GAC round, that is the same for rounds with the same
+    solution.
+
+    The opponent board is normalized to the defense teams the solver
+    sees, the empty and eliminated teams are removed and only the zones
+    in focus are kept. The order of the zones and the teams is kept, as it
+    decides which solution is returned when two have the same total.
+
+    Parameters
+    ----------
+    mode : str
+        The GAC mode, 3v3 or 5v5.
+    min_gear_level : int
+        The minimum gear level of the characters.
+    available_units : list[str]
+        The base_id of the player units that can attack.
+    opponent : dict
+        The opponent defense of each zone.
+    focus_zone : list[str]
+        The zones to focus on.
+    solver : str, optional
+        The name of the solver, by default "bitmask". The options of the
+        search, eg. the workers and the time limit, are not part of the
+        key, as they don't change the solution once the search is
+        finished.
+    data_version : float | None, optional
+        The version of the counter data, so the solutions from old data
+        are not used, by default None.
+    exact : bool, optional
+        If only the counters that can't change the solution are removed
+        before the search, see `GAC.dominance`, by default True.
+    max_values : int | None, optional
+        The maximum number of counters of each team, without `exact`, by
+        default None.
+
+    Returns
+    -------
+    str
+        The SHA-256 hex digest of the round.
+    """
+    board = [
+        [
+            zone,
+            [
+                [character["base_id"] for character in team["defense"]]
+                for team in opponent[zone]
+                if team["defense"] and not team["eliminated"]
+            ],
+        ]
+        for zone in opponent
+        if zone in focus_zone
+    ]
+    round_key = {
+        "mode": mode,
+        "min_gear_level": min_gear_level,
+        "available_units": sorted(set(available_units)),
+        "opponent": board,
+        "focus_zone": sorted(focus_zone),
+        "solver": solver,
+        "data_version": data_version,
+        "exact": exact,
+        "max_values": None if exact else max_values,
+    }
+    data = json.dumps(round_key, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode()).hexdigest()
@@ -0,0 +1,433 @@
+"""
+# Counter data
+
+The counters of each mode, 3v3.json and 5v5.json, are loaded once and kept
+in memory, instead of parsing the file on every request. The data is read
+only, indexed by the leader of the defense team and by the signature of the
+defense team, so the counters of the exact same defense are a single lookup.
+Each counter also has its attack team as a frozenset and as a bitmask of the
+units, so the counters that a roster can use are found with set operations.
+
+When there are not enough counters for the exact defense, the counters of
+similar defense teams are ranked by the Jaccard similarity of the members,
+weighted by how often the fight was seen. The members of the stored defense
+teams are indexed, so only the counters that share a member are scored.
+
+The counters of the JSON file are all indexed when the file is loaded, so
+the solver processes that start after `reload_counters` get the indexes
+without building them on a request. If `create_data` wrote a binary store
+of the mode, 3v3.bin or 5v5.bin, it's memory mapped instead of parsing the
+JSON file, and only the counters of a leader are decoded and indexed the
+first time they are used. A store that is older than the JSON file is not
+used, the JSON file was written again without it.
+
+The file is reloaded when it changes, eg. after `create_data` runs. Each
+process checks the modification time of the file at most every
+CHECK_INTERVAL seconds, so the worker processes of the solver pool also
+get the new data.
+
+"""
+
+from types import MappingProxyType
+from collections.abc import Iterable, Mapping, Sequence
+from printinglog import Logger
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+
+from .store import CounterStore
+
+logger = Logger(format="simple")
+
+MODES = ("3v3", "5v5")
+
+# Seconds between each check if the file changed
+CHECK_INTERVAL = 5
+
+# Extension of the binary store, it's used instead of the JSON file if it's not older
+STORE_EXTENSION = ".bin"
+
+# Number of times a fight is seen for its similarity to count half, so a
+# counter that was seen a few times ranks lower than a common one
+SEEN_WEIGHT = 10
+
+
+class CounterData:
+    """
+    The counters of a mode, by the leader of the defense team.
+
+    Attributes
+    ----------
+    mode : str
+        The GAC mode, 3v3 or 5v5.
+    path : str
+        The path of the JSON or store file.
+    mtime : float
+        The modification time of the file when it was loaded.
+    source : Mapping[str, Sequence[dict]]
+        The counters of each leader as in the file, the parsed JSON or a
+        memory mapped `CounterStore`.
+    units : Mapping[str, int]
+        The bit of each unit in the counter data, the interned unit ids of
+        the store or the units of the attack teams in the JSON file.
+
+    """
+
+    def __init__(self, mode: str, path: str):
+        """
+        Load the counters of a mode from the JSON or store file.
+
+        Parameters
+        ----------
+        mode : str
+            The GAC mode, 3v3 or 5v5.
+        path : str
+            The path of the JSON or store file.
+        """
+        self.mode = mode
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+
+        self.source: Mapping[str, Sequence[dict]]
+        if path.endswith(STORE_EXTENSION):
+            self.source = CounterStore(path)
+            units: Iterable[str] = self.source.units
+        else:
+            with open(path, "r") as f:
+                self.source = json.load(f)
+            units = dict.fromkeys(
+                base_id
+                for counters in self.source.values()
+                for counter in counters
+                for base_id in counter["attack"]
+            )
+        self.units: Mapping[str, int] = MappingProxyType(
+            {base_id: 1 << bit for bit, base_id in enumerate(units)}
+        )
+
+        # The read only counters and the signature index of each leader,
+        # made on the first lookup of the leader for the store
+        self._leaders: dict[str, tuple[Mapping, ...]] = {}
+        self._signatures: dict[str, Mapping[frozenset[str], tuple[Mapping, ...]]] = {}
+        self._similarity: dict[str, Mapping] = {}
+        self._lock = threading.Lock()
+        if not isinstance(self.source, CounterStore):
+            for leader in self.source:
+                self._load_leader(leader)
+
+    def __getitem__(self, leader: str) -> tuple[Mapping, ...]:
+        counters = self._leaders.get(leader)
+        if counters is None:
+            counters = self._load_leader(leader)
+        return counters
+
+    def __contains__(self, leader: str) -> bool:
+        return leader in self.source
+
+    def get(self, leader: str, default=()) -> tuple[Mapping, ...]:
+        if leader not in self:
+            return default
+        return self[leader]
+
+    def _load_leader(self, leader: str) -> tuple[Mapping, ...]:
+        units = self.units
+        counters = tuple(
+            MappingProxyType(
+                {
+                    **counter,
+                    "defense": tuple(counter["defense"]),
+                    "attack": tuple(counter["attack"]),
+                    "attack_set": frozenset(counter["attack"]),
+                    "attack_mask": sum(
+                        units[base_id] for base_id in set(counter["attack"])
+                    ),
+                }
+            )
+            for counter in self.source[leader]
+        )
+
+        # The counters are listed under the leader they were scraped for,
+        # so that leader is used for the signature, in the same order
+        signatures: dict[frozenset[str], list[Mapping]] = {}
+        # For the similarity, the counters with each member in the defense
+        # except the leader, that nearly all of them have
+        postings: dict[str, list[int]] = {}
+        similarity: dict[str, list] = {
+            "sizes": [],
+            "weights": [],
+            "with_leader": [],
+            "masks": [],
+        }
+        for index, counter in enumerate(counters):
+            members = frozenset(counter["defense"])
+            signatures.setdefault(members, []).append(counter)
+            for member in members - {leader}:
+                postings.setdefault(member, []).append(index)
+            seen = counter.get("seen")
+            similarity["sizes"].append(len(members))
+            similarity["weights"].append(
+                1 if seen is None else seen / (seen + SEEN_WEIGHT)
+            )
+            similarity["with_leader"].append(leader in members)
+            similarity["masks"].append(counter["attack_mask"])
+
+        with self._lock:
+            if leader not in self._leaders:
+                self._signatures[leader] = MappingProxyType(
+                    {members: tuple(found) for members, found in signatures.items()}
+                )
+                self._similarity[leader] = MappingProxyType(
+                    {
+                        "postings": MappingProxyType(
+                            {member: tuple(found) for member, found in postings.items()}
+                        ),
+                        **{key: tuple(values) for key, values in similarity.items()},
+                    }
+                )
+                self._leaders[leader] = counters
+            return self._leaders[leader]
+
+    def exact(self, signature: tuple[str, frozenset[str]]) -> tuple[Mapping, ...]:
+        """
+        The counters of the exact same defense team.
+
+        Parameters
+        ----------
+        signature : tuple[str, frozenset[str]]
+            The `defense_signature` of the defense team.
+
+        Returns
+        -------
+        tuple[Mapping, ...]
+            The counters of the defense team, in the order of the file.
+        """
+        leader, members = signature
+        if leader not in self:
+            return ()
+        if leader not in self._signatures:
+            self._load_leader(leader)
+        return self._signatures[leader].get(members, ())
+
+    def similar(
+        self,
+        signature: tuple[str, frozenset[str]],
+        limit: int,
+        roster_mask: int | None = None,
+    ) -> list[Mapping]:
+        """
+        The counters of the defense teams most similar to a defense team.
+
+        The similarity is the Jaccard similarity of the members, times
+        seen / (seen + SEEN_WEIGHT) so the rare fights rank lower.
+
+        Parameters
+        ----------
+        signature : tuple[str, frozenset[str]]
+            The `defense_signature` of the defense team.
+        limit : int
+            The maximum number of counters.
+        roster_mask : int | None, optional
+            Only rank the counters the roster has the units for, by default
+            all counters.
+
+        Returns
+        -------
+        list[Mapping]
+            The most similar counters first, the exact matches included.
+        """
+        leader, members = signature
+        if leader not in self or limit <= 0:
+            return []
+        counters = self[leader]
+        index = self._similarity[leader]
+        sizes, weights = index["sizes"], index["weights"]
+        with_leader, masks = index["with_leader"], index["masks"]
+        missing = 0 if roster_mask is None else ~roster_mask
+
+        # The number of shared members other than the leader
+        shared: dict[int, int] = {}
+        for member in members - {leader}:
+            for row in index["postings"].get(member, ()):
+                shared[row] = shared.get(row, 0) + 1
+
+        # The counters by the number of shared members, the ones that only
+        # share the leader are not in the postings and added if needed
+        levels: dict[int, list[int]] = {}
+        for row, count in shared.items():
+            levels.setdefault(count + with_leader[row], []).append(row)
+        if leader in members:
+            levels.setdefault(1, [])
+
+        # The best counters in a heap, the earlier counter first if the
+        # similarity is the same
+        best: list[tuple[float, int]] = []
+        for count in sorted(levels, reverse=True):
+            # No counter with fewer shared members can be more similar than
+            # count / len(members), so the rest are skipped if all are better
+            if len(best) == limit and best[0][0] > count / len(members):
+                break
+            rows: Iterable[int] = levels[count]
+            if count == 1 and leader in members:
+                rows = itertools.chain(
+                    rows,
+                    (
+                        row
+                        for row in range(len(counters))
+                        if with_leader[row] and row not in shared
+                    ),
+                )
+            for row in rows:
+                if masks[row] & missing:
+                    continue
+                similarity = count / (len(members) + sizes[row] - count) * weights[row]
+                if len(best) < limit:
+                    heapq.heappush(best, (similarity, -row))
+                elif (similarity, -row) > best[0]:
+                    heapq.heapreplace(best, (similarity, -row))
+        return [counters[-row] for _, row in sorted(best, reverse=True)]
+
+    def roster_mask(self, base_ids: Iterable[str]) -> int:
+        """
+        The bitmask of the units of a roster.
+
+        Parameters
+        ----------
+        base_ids : Iterable[str]
+            The base_id of the units the player can use.
+
+        Returns
+        -------
+        int
+            The bits of the units, the units that are not in the counter
+            data are left out.
+        """
+        units = self.units
+        mask = 0
+        for base_id in base_ids:
+            mask |= units.get(base_id, 0)
+        return mask
+
+    def available(self, counters: Iterable[Mapping], roster_mask: int) -> list[Mapping]:
+        """
+        The counters that only use units of the roster, in the same order.
+
+        Parameters
+        ----------
+        counters : Iterable[Mapping]
+            The counters to filter, from this data.
+        roster_mask : int
+            The bitmask of the roster, from `roster_mask`.
+
+        Returns
+        -------
+        list[Mapping]
+            The counters whose attack team is a subset of the roster.
+        """
+        missing = ~roster_mask
+        return [counter for counter in counters if not counter["attack_mask"] & missing]
+
+
+def defense_signature(defense: Iterable[str]) -> tuple[str, frozenset[str]]:
+    """
+    The signature of a defense team, the leader and the set of all members.
+
+    Parameters
+    ----------
+    defense : Iterable[str]
+        The base_id of the characters, the leader first.
+
+    Returns
+    -------
+    tuple[str, frozenset[str]]
+        The leader and the members, that don't depend on the order.
+    """
+    members = list(defense)
+    return members[0], frozenset(members)
+
+
+_loaded: dict[str, CounterData] = {}
+_checked: dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def counters_path(mode: str) -> str:
+    """
+    The path of the counter file of a mode, the binary store if it exists
+    and it's not older than the JSON file, otherwise the JSON file.
+
+    `create_data` writes the store after the JSON file, so a store that is
+    older has the counters from before the JSON file was written again.
+    """
+    path = os.path.join(os.getcwd(), "GAC/data", mode)
+    store_path = path + STORE_EXTENSION
+    json_path = path + ".json"
+    if os.path.exists(store_path) and (
+        not os.path.exists(json_path)
+        or os.path.getmtime(store_path) >= os.path.getmtime(json_path)
+    ):
+        return store_path
+    return json_path
+
+
+def get_counters(mode: str) -> CounterData:
+    """
+    The counters of a mode, loaded on the first call and reloaded if the
+    file changed.
+
+    Parameters
+    ----------
+    mode : str
+        The GAC mode, 3v3 or 5v5.
+
+    Returns
+    -------
+    CounterData
+        The counters of the mode.
+    """
+    now = time.monotonic()
+    with _lock:
+        data = _loaded.get(mode)
+        if data is not None and now - _checked[mode] < CHECK_INTERVAL:
+            return data
+        _checked[mode] = now
+        path = counters_path(mode)
+        if (
+            data is None
+            or path != data.path
+            or os.path.getmtime(path) != data.mtime
+        ):
+            logger.info(f"Loading counters for {mode}")
+            data = CounterData(mode, path)
+            _loaded[mode] = data
+        return data
+
+
+def reload_counters(modes: tuple[str, ...] = MODES) -> dict[str, float]:
+    """
+    Load the counters of the modes again, even if the files didn't change.
+
+    Parameters
+    ----------
+    modes : tuple[str, ...], optional
+        The modes to load, by default all of them.
+
+    Returns
+    -------
+    dict[str, float]
+        The modification time of each loaded file.
+    """
+    loaded = {}
+    for mode in modes:
+        path = counters_path(mode)
+        if not os.path.exists(path):
+            logger.warning(f"No counters for {mode}: {path}")
+            continue
+        data = CounterData(mode, path)
+        with _lock:
+            _loaded[mode] = data
+            _checked[mode] = time.monotonic()
+        loaded[mode] = data.mtime
+    return loaded
@@ -15,7 +15,9 @@ from utils import (
     get_5v5_seasons,
     get_season_date,
 )
+from store import write_counter_store
 from rich import print
+import os
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
@@ -352,6 +354,11 @@ def run():
 
         # 5. Save the data to a file
         write_to_file(sorted_data, f"{mode}.json")
+
+        # 6. Save the compact binary copy, that the web app memory maps
+        write_counter_store(
+            sorted_data, os.path.join(os.getcwd(), "GAC/data", f"{mode}.bin")
+        )
         print(f"Finished creating {mode} data")
 
 
@@ -25,11 +25,25 @@ There are mainly three components in a CSP:
 
 """
 
+from collections.abc import Callable
 from printinglog import Logger
-import copy
+from .bounds import BOUNDS
+from .dominance import reduce_values, search_space
+from .packing import SetPackingSolver
+import inspect
+import time
 
 logger = Logger(format="simple")
 
+# Number of nodes between each progress report
+PROGRESS_INTERVAL = 4096
+
+
+class SearchLimitReached(Exception):
+    """
+    Raised when the solver runs out of time or nodes.
+    """
+
 
 class CSP:
     """
@@ -51,6 +65,8 @@ class CSP:
         The maximum total win rate found.
     iteration : int
         The number of iterations.
+    best_assignment : tuple[tuple[int, int | None], ...]
+        The variable and counter index of the best solution found.
 
     """
 
@@ -78,6 +94,7 @@ class CSP:
         self.solution = None
         self.max_total_win_rate = -1
         self.iteration = 0
+        self.best_assignment: tuple = ()
 
     def solve(self):
         """
@@ -85,6 +102,7 @@ class CSP:
         """
         assignment = []
         self.backtrack(assignment)
+        self.solution = self.build_solution(self.best_assignment)
         return self.solution
 
     def backtrack(self, assignment: list):
@@ -94,25 +112,25 @@ class CSP:
         Parameters
         ----------
         assignment : list
-            A list of tuples with the variable index and the domain values.
+            A list of tuples with the variable index, the counter index
+            and the counter. The counter index is None if no counter
+            was assigned.
         """
         # If the assignment is complete, check if it is the best solution
         if len(assignment) == len(self.variables):
             # Calculate the total win rate for the assignment
-            total_win_rate = sum(
-                counter["best_team"]["win_rate"] for _, counter in assignment
-            )
-            # Save the best solution, which will be returned when done
+            total_win_rate = sum(value["win_rate"] for _, _, value in assignment)
+            # Save the best solution, which will be built when done
             if total_win_rate > self.max_total_win_rate:
                 self.max_total_win_rate = total_win_rate
-                self.solution = copy.deepcopy(assignment)
+                self.best_assignment = tuple(
+                    (var, index) for var, index, _ in assignment
+                )
 
             return
 
         # Calculate the potential maximum total win rate from this point
-        potential_total = sum(
-            counter["best_team"]["win_rate"] for _, counter in assignment
-        )
+        potential_total = sum(value["win_rate"] for _, _, value in assignment)
         # Calculate the maximum win rate for the remaining variables
         remaining_win_rates = [
             max(
@@ -133,8 +151,10 @@ class CSP:
         # Get the first variable index that is not in the assignment
         var = self.select_unassigned_variable(assignment)
         assigned = False
+        counters = self.order_domain(var)["counters"]
         # Iterate over the domain values for the variable
-        for value in self.order_domain_values(var):
+        for index in self.order_domain_indices(var):
+            value = counters[index]
             """
             value:
             {
@@ -154,21 +174,17 @@ class CSP:
 
             # Check if the value is consistent with the assignment
             if self.is_consistent(var, value, assignment):
-                # Order the domain values for the variable index
-                domain = self.order_domain(var)
-                # Add the best team to the domain
-                domain["best_team"] = value
-                # Add the variable and domain to the assignment
-                assignment.append((var, domain))
+                # Add the variable and the counter to the assignment
+                assignment.append((var, index, value))
 
                 # Log the assignment
                 if self.logging:
                     print("\n=================================================")
                     logger.info(f"ITERATION {self.iteration}\n")
-                    for i, counter in assignment:
-                        print(f"({i}) Defense: {counter['defense']}")
+                    for i, _, counter in assignment:
+                        print(f"({i}) Defense: {self.order_domain(i)['defense']}")
                         print(
-                            f"Best counter ({counter['best_team']['win_rate']}): {counter['best_team']['attack']}\n"
+                            f"Best counter ({counter['win_rate']}): {counter['attack']}\n"
                         )
                     print("\n---------------------------------------------\n")
                     self.iteration += 1
@@ -180,12 +196,35 @@ class CSP:
 
         # If no value was assigned, add the variable without a value
         if not assigned:
-            domain = self.order_domain(var)
-            domain["best_team"] = {"attack": [], "win_rate": 0}
-            assignment.append((var, domain))
+            assignment.append((var, None, {"attack": [], "win_rate": 0}))
             self.backtrack(assignment)
             assignment.pop()
 
+    def build_solution(self, assignment: tuple) -> list[tuple[int, dict]]:
+        """
+        Build the solution from the variable and counter indices.
+
+        Parameters
+        ----------
+        assignment : tuple
+            A tuple with the variable and counter index for each variable.
+
+        Returns
+        -------
+        list[tuple[int, dict]]
+            A list of tuples with the variable index and the domain,
+            with the assigned counter as "best_team".
+        """
+        solution = []
+        for var, index in assignment:
+            domain = self.order_domain(var)
+            if index is None:
+                best_team = {"attack": [], "win_rate": 0}
+            else:
+                best_team = domain["counters"][index]
+            solution.append((var, {**domain, "best_team": best_team}))
+        return solution
+
     def select_unassigned_variable(self, assignment: list):
         """
         Selects the variable with the smallest domain size.
@@ -275,11 +314,17 @@ class CSP:
         """
         domain = self.order_domain(index=var)
         # Order the domains values for the variable index
-        # domain_value = [counter for counter in domain["counters"]]
-        domain_value = sorted(
-            domain["counters"], key=lambda x: x["win_rate"], reverse=True
+        return [domain["counters"][i] for i in self.order_domain_indices(var)]
+
+    def order_domain_indices(self, var) -> list[int]:
+        """
+        Returns the indices of the domain values, with the
+        highest win rate first.
+        """
+        counters = self.order_domain(index=var)["counters"]
+        return sorted(
+            range(len(counters)), key=lambda i: counters[i]["win_rate"], reverse=True
         )
-        return domain_value
 
     def is_consistent(self, var: int, value: dict, assignment: list) -> bool:
         """
@@ -292,7 +337,7 @@ class CSP:
         value : dict
             The domain value for the index team.
         assignment : list
-            A list with all the values with their index.
+            A list with all the values with their variable and counter index.
 
         Returns
         -------
@@ -314,19 +359,9 @@ class CSP:
             "win_rate": 100,
             "has_gl": True
         }
-        assignment = [(index, dict={
-
-                "defense": [CHARACTER1, ...],
-                "counters": [
-                    {
-                        "attack": [CHARACTER1, ...],
-                        "win_rate": 100
-                    },..
-                ],
-                "best_team": {
-                    "attack": [CHARACTER1, ...],
-                    "win_rate": 100
-                }
+        assignment = [(index, counter_index, dict={
+                "attack": [CHARACTER1, ...],
+                "win_rate": 100
             })]
         """
 
@@ -336,10 +371,10 @@ class CSP:
 
         # 2. Compare if unit exists in any other team
         for unit in value["attack"]:
-            for _, team in assignment:
+            for _, _, team in assignment:
                 # Same Unit exists in other assigned team
                 if unit["base_id"] in [
-                    character["base_id"] for character in team["best_team"]["attack"]
+                    character["base_id"] for character in team["attack"]
                 ]:
                     return False
 
@@ -351,7 +386,800 @@ class CSP:
         return True
 
 
-def calculate(data: dict):
+class BitmaskCSP:
+    """
+    A bitmask based version of the CSP.
+
+    Every unit in the domains is interned to an integer bit once, so each
+    counter becomes an int mask and the units already used by the
+    assignment is a single int. Checking consistency is then a single AND
+    instead of comparing lists of base_ids. The domain values are sorted
+    once, and the variable order (MRV) is computed once as well, since the
+    domain sizes never change during the search.
+
+    The search explores the values in the exact same order as `CSP`, so
+    both returns the same solution. `CSP` is kept as reference. The only
+    difference is that the GL win rate threshold is also applied to the
+    first assigned team, which `CSP.is_consistent` lets through.
+
+    With forward checking, assigning a counter removes every counter that
+    shares a unit from the domains of the unassigned variables, and the
+    removed counters are restored from an undo trail on backtrack. Each
+    domain is kept as a bitset over its values, so removing the counters
+    with a unit is a single AND. The pruning bound only uses the best legal
+    value of each domain, so when a domain empties that team can't get a
+    counter anymore, the bound drops and the path is pruned right away if
+    it can't beat the best solution. The variable order stays the same, as
+    every team that still has a legal counter gets one, so a different
+    order would change which teams are filled.
+
+    The pruning bound is pluggable, see `GAC.bounds`. The bounds are tried
+    in the given order, so the cheap ones should come first, and the number
+    of nodes each bound pruned is counted in `pruned`.
+
+    The solver is anytime. It starts from a greedy solution and improves it
+    until the search is done, or until the time or node limit is reached,
+    then the best solution found is returned and `optimal` tells if it was
+    proven to be the best. `iter_solutions` yields each improved solution.
+
+    With more than one worker, the search is split at the first variables
+    in the order and the subproblems are solved in a process pool, see
+    `GAC.parallel`. The solution is the same as the serial search.
+
+    The search can be warm started from a previous solution, eg. after a
+    team is eliminated, see `warm_start`.
+
+    Before the search, the dominated counters are removed from the domains,
+    see `GAC.dominance`. With `exact` the solution is the same, otherwise
+    more counters are removed and the domains can be capped at `max_values`,
+    and the solution is never reported as `optimal`.
+
+    Attributes
+    ----------
+    variables : list[int]
+        A list of variable indices.
+    domains : list[tuple[int, dict]]
+        A list of tuples with the variable index and the domain values.
+    logging : bool
+        A optional boolean to enable logging.
+    solution : list
+        The best solution found.
+    max_total_win_rate : float
+        The maximum total win rate found.
+    iteration : int
+        The number of iterations.
+    unit_bits : dict[str, int]
+        The bit for each unit base_id.
+    values : dict[int, list[tuple[int, int, int]]]
+        The (mask, score, counter index) for each variable, best first.
+    order : list[int]
+        The order the variables are assigned in.
+    forward_checking : bool
+        A boolean to enable forward checking.
+    bounds : list
+        The bounds used to prune the search.
+    nodes : int
+        The number of nodes explored.
+    pruned : dict[str, int]
+        The number of nodes pruned by each bound.
+    time_limit : float | None
+        The maximum number of seconds to search.
+    node_limit : int | None
+        The maximum number of nodes to explore.
+    optimal : bool
+        True if the search finished with `exact`, so the solution is proven
+        the best.
+    workers : int
+        The number of worker processes, 1 searches in this process.
+    split_depth : int
+        The number of variables assigned in each parallel subproblem.
+    warm_start : dict[int, int | None] | None
+        The counter index of each variable in a previous solution.
+    progress : Callable[[dict], None] | None
+        Called with the search progress, see `report_progress`.
+    exact : bool
+        Only remove the counters that can't change the solution.
+    max_values : int | None
+        The maximum number of values of each domain, without `exact`.
+    replaced : dict[int, dict[int, int]]
+        The counter index that replaces each removed dominated counter.
+    reduction : dict
+        The number of values and the log10 of the search space, before
+        and after the dominated counters are removed.
+
+    """
+
+    def __init__(
+        self,
+        variables: list[int],
+        domains: list[tuple[int, dict]],
+        logging: bool = False,
+        forward_checking: bool = True,
+        bounds: tuple[str, ...] = ("sum", "matching"),
+        time_limit: float | None = None,
+        node_limit: int | None = None,
+        workers: int = 1,
+        split_depth: int = 2,
+        warm_start: dict[int, int | None] | None = None,
+        progress: Callable[[dict], None] | None = None,
+        exact: bool = True,
+        max_values: int | None = None,
+    ):
+        """
+        Constructs all the necessary attributes for the BitmaskCSP object.
+
+        Parameters
+        ----------
+        variables : list[int]
+            A list of variable indices.
+        domains : list[tuple[int, dict]]
+            A list of tuples with the variable index and the domain values.
+        logging : bool, optional
+            A boolean to enable logging, by default False.
+        forward_checking : bool, optional
+            A boolean to enable forward checking, by default True.
+        bounds : tuple[str, ...], optional
+            The names of the bounds to prune with, by default all of them.
+            The "sum" bound is always used first, as it is free.
+        time_limit : float | None, optional
+            The maximum number of seconds to search, by default no limit.
+        node_limit : int | None, optional
+            The maximum number of nodes to explore, by default no limit.
+            With more than one worker, the limit is for each subproblem.
+        workers : int, optional
+            The number of worker processes, by default 1.
+        split_depth : int, optional
+            The number of variables assigned in each parallel subproblem,
+            by default 2.
+        warm_start : dict[int, int | None] | None, optional
+            The counter index of each variable in a previous solution, the
+            search starts from it after it is repaired, by default None.
+        progress : Callable[[dict], None] | None, optional
+            Called with the search progress when a better solution is found
+            and every PROGRESS_INTERVAL nodes, by default None.
+        exact : bool, optional
+            Only remove the dominated counters with the same units as a
+            better counter, so the solution is the same, by default True.
+        max_values : int | None, optional
+            Keep at most this many counters for each team, only used
+            without `exact`, by default no limit.
+        """
+        self.variables = variables
+        self.domains = domains
+        self.logging = logging
+        self.forward_checking = forward_checking
+        self.workers = workers
+        self.split_depth = split_depth
+        self.warm_start = warm_start
+        self.progress = progress
+        self.exact = exact
+        # The cap is not used with `exact`, so it doesn't count as one
+        self.max_values = None if exact else max_values
+        self.solution = None
+        self.max_total_win_rate = -1
+        self.iteration = 0
+        self.nodes = 0
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.deadline = None
+        self.optimal = False
+
+        # Same lookup as CSP.order_domain, first domain with the index
+        self.domain: dict[int, dict] = {}
+        for index, domain in domains:
+            self.domain.setdefault(index, domain)
+
+        self.unit_bits: dict[str, int] = {}
+        self.values: dict[int, list[tuple[int, int, int]]] = {
+            var: self.intern_domain(self.domain[var]) for var in variables
+        }
+
+        # Remove the dominated counters, after the domains are interned so
+        # the variable order below still uses the full domain sizes
+        sizes = [len(self.values[var]) for var in variables]
+        self.replaced: dict[int, dict[int, int]] = {}
+        for var in variables:
+            self.values[var], self.replaced[var] = reduce_values(
+                self.values[var], exact=exact, max_values=max_values
+            )
+        reduced_sizes = [len(self.values[var]) for var in variables]
+        self.reduction = {
+            "values_before": sum(sizes),
+            "values_after": sum(reduced_sizes),
+            "search_space_before": search_space(sizes),
+            "search_space_after": search_space(reduced_sizes),
+        }
+
+        # MRV: Minimum Remaining Values, the domain sizes are static
+        # so the order is the same as CSP.select_unassigned_variable
+        self.order = sorted(
+            variables, key=lambda var: len(self.domain[var]["counters"])
+        )
+
+        # remaining[i] is the sum of the best scores from order[i:]
+        self.remaining = [0] * (len(self.order) + 1)
+        for i in range(len(self.order) - 1, -1, -1):
+            values = self.values[self.order[i]]
+            best = values[0][1] if values else 0
+            self.remaining[i] = self.remaining[i + 1] + best
+
+        self.best_score = -1
+        self.best_assignment: tuple = ()
+
+        # Forward checking state, the legal values left for each variable
+        # as a bitset over the positions in `values`, and the sum of the
+        # best legal value of the unassigned variables
+        self.live: dict[int, int] = {}
+        self.scores: dict[int, list[int]] = {}
+        self.value_units: dict[int, list[tuple[int, ...]]] = {}
+        self.unit_values: dict[int, dict[int, int]] = {}
+        for var in variables:
+            self.live[var] = (1 << len(self.values[var])) - 1
+            self.scores[var] = [value[1] for value in self.values[var]]
+            self.value_units[var] = []
+            self.unit_values[var] = {}
+            for position, (mask, _, _) in enumerate(self.values[var]):
+                units = tuple(bit for bit in range(mask.bit_length()) if mask >> bit & 1)
+                self.value_units[var].append(units)
+                for unit in units:
+                    self.unit_values[var][unit] = (
+                        self.unit_values[var].get(unit, 0) | 1 << position
+                    )
+        self.remaining_best = self.remaining[0]
+
+        if "sum" not in bounds:
+            bounds = ("sum", *bounds)
+        for name in bounds:
+            if name not in BOUNDS:
+                raise ValueError(f"Unknown bound: {name}")
+        self.bounds = [BOUNDS[name]() for name in bounds]
+        self.pruned = {bound.name: 0 for bound in self.bounds}
+        for bound in self.bounds:
+            bound.prepare(self)
+
+    def intern_domain(self, domain: dict) -> list[tuple[int, int, int]]:
+        """
+        Intern the counters of a domain to bitmasks.
+
+        Parameters
+        ----------
+        domain : dict
+            The domain with the "counters" for a variable.
+
+        Returns
+        -------
+        list[tuple[int, int, int]]
+            The (mask, score, counter index) for each counter that can
+            be used, sorted with the highest win rate first.
+        """
+        # Sorted the same way as CSP.order_domain_values
+        ordered = sorted(
+            enumerate(domain["counters"]),
+            key=lambda x: x[1]["win_rate"],
+            reverse=True,
+        )
+        values = []
+        for index, counter in ordered:
+            # If defense team has a GL, then win rate
+            # threshold should be 80% or more...
+            if counter["has_gl"] and counter["win_rate"] < 80:
+                continue
+            mask = 0
+            for unit in counter["attack"]:
+                bit = self.unit_bits.setdefault(unit["base_id"], len(self.unit_bits))
+                mask |= 1 << bit
+            values.append((mask, score(counter["win_rate"]), index))
+        return values
+
+    def solve(self):
+        """
+        Solves the CSP problem.
+        """
+        for _ in self.iter_solutions():
+            pass
+        return self.solution
+
+    def iter_solutions(self):
+        """
+        Solves the CSP problem, and yields each improved solution.
+
+        The first solution is the greedy one. When the generator is
+        exhausted, `solution` holds the best solution and `optimal`
+        tells if the search finished within the limits.
+
+        Yields
+        ------
+        list[tuple[int, dict]]
+            The best solution found so far, in the same format as `solve`.
+        """
+        if self.time_limit is not None:
+            self.deadline = time.monotonic() + self.time_limit
+
+        # Start from the greedy solution, so there is always something
+        # to return, even if the limit is reached right away
+        self.save_solution(*self.greedy())
+        if self.warm_start is not None:
+            total, assignment = self.repair(self.warm_start)
+            # The scores are integers, so with a best score of one less
+            # the search still finds the same solution as without the
+            # warm start, if another solution has the same total
+            if total - 1 > self.best_score:
+                self.best_score = total - 1
+                self.max_total_win_rate = total / 100
+                self.best_assignment = tuple(assignment)
+        self.solution = self.build_solution(self.best_assignment)
+        self.report_progress()
+        yield self.solution
+
+        try:
+            if self.workers > 1:
+                # Imported here, GAC.parallel imports this module
+                from .parallel import search_parallel
+
+                search = search_parallel(self)
+            elif self.forward_checking:
+                search = self.backtrack_forward(depth=0, total=0, assignment=[])
+            else:
+                search = self.backtrack(depth=0, used=0, total=0, assignment=[])
+            for solution in search:
+                self.solution = solution
+                self.report_progress()
+                yield solution
+            # Without `exact`, counters that are not dominated could have
+            # been removed, so the finished search is not proven the best
+            self.optimal = self.exact and self.max_values is None
+        except SearchLimitReached:
+            logger.warning(f"Search limit reached after {self.nodes} nodes")
+        self.report_progress()
+
+    def report_progress(self):
+        """
+        Report the search progress to the `progress` callback, if any.
+
+        The progress has the number of nodes explored, the total win rate
+        of the best solution found and if it is proven the best.
+        """
+        if self.progress is not None:
+            self.progress(
+                {
+                    "nodes": self.nodes,
+                    "max_total_win_rate": self.max_total_win_rate,
+                    "optimal": self.optimal,
+                }
+            )
+
+    def greedy(self) -> tuple[int, list]:
+        """
+        Assign the best consistent value to each variable in order.
+
+        Returns
+        -------
+        tuple[int, list]
+            The total score and the assignment.
+        """
+        used = 0
+        total = 0
+        assignment = []
+        for var in self.order:
+            index = None
+            for mask, value_score, value_index in self.values[var]:
+                if not mask & used:
+                    used |= mask
+                    total += value_score
+                    index = value_index
+                    break
+            assignment.append((var, index))
+        return total, assignment
+
+    def repair(self, previous: dict[int, int | None]) -> tuple[int, list]:
+        """
+        Repair a previous solution, so it is a solution of this problem.
+
+        Each variable keeps its previous counter if it is still consistent,
+        otherwise it gets the best consistent counter, same as `greedy`.
+        A variable without a previous counter also gets the best consistent
+        counter, as units can be freed by an eliminated team.
+
+        Parameters
+        ----------
+        previous : dict[int, int | None]
+            The counter index of each variable in the previous solution.
+
+        Returns
+        -------
+        tuple[int, list]
+            The total score and the assignment.
+        """
+        used = 0
+        total = 0
+        assignment = []
+        for var in self.order:
+            values = self.values[var]
+            # A dominated counter was replaced by a better one
+            wanted = self.replaced[var].get(previous.get(var), previous.get(var))
+            chosen = None
+            for mask, value_score, value_index in values:
+                if value_index == wanted and not mask & used:
+                    chosen = (mask, value_score, value_index)
+                    break
+            if chosen is None:
+                for mask, value_score, value_index in values:
+                    if not mask & used:
+                        chosen = (mask, value_score, value_index)
+                        break
+            if chosen is None:
+                assignment.append((var, None))
+                continue
+            mask, value_score, value_index = chosen
+            used |= mask
+            total += value_score
+            assignment.append((var, value_index))
+        return total, assignment
+
+    def count_node(self):
+        """
+        Count an explored node, and stop the search if a limit is reached.
+        """
+        self.nodes += 1
+        if self.progress is not None and self.nodes % PROGRESS_INTERVAL == 0:
+            self.report_progress()
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchLimitReached()
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise SearchLimitReached()
+
+    def backtrack(self, depth: int, used: int, total: int, assignment: list):
+        """
+        Backtracking algorithm to solve the CSP problem.
+
+        Yields each solution that is better than the best one so far.
+
+        Parameters
+        ----------
+        depth : int
+            The position in `order` of the variable to assign.
+        used : int
+            The mask with all units used by the assignment.
+        total : int
+            The total score of the assignment.
+        assignment : list
+            A list of tuples with the variable and counter index,
+            the counter index is None if no counter was assigned.
+        """
+        self.count_node()
+        # If the assignment is complete, check if it is the best solution
+        if depth == len(self.order):
+            if self.save_solution(total, assignment):
+                yield self.build_solution(self.best_assignment)
+            return
+
+        # Prune this path as it cannot improve the best solution
+        if self.prune(depth, used, total):
+            return
+
+        var = self.order[depth]
+        assigned = False
+        for mask, value_score, index in self.values[var]:
+            # Consistent if none of the units are already used
+            if mask & used:
+                continue
+            assigned = True
+            assignment.append((var, index))
+
+            if self.logging:
+                logger.info(f"ITERATION {self.iteration}: {assignment}")
+                self.iteration += 1
+
+            yield from self.backtrack(
+                depth + 1, used | mask, total + value_score, assignment
+            )
+            assignment.pop()
+
+        # If no value was assigned, add the variable without a value
+        if not assigned:
+            assignment.append((var, None))
+            yield from self.backtrack(depth + 1, used, total, assignment)
+            assignment.pop()
+
+    def backtrack_forward(self, depth: int, total: int, assignment: list):
+        """
+        Backtracking algorithm with forward checking.
+
+        Yields each solution that is better than the best one so far.
+
+        Parameters
+        ----------
+        depth : int
+            The position in `order` of the variable to assign.
+        total : int
+            The total score of the assignment.
+        assignment : list
+            A list of tuples with the variable and counter index,
+            the counter index is None if no counter was assigned.
+        """
+        self.count_node()
+        # If the assignment is complete, check if it is the best solution
+        if depth == len(self.order):
+            if self.save_solution(total, assignment):
+                yield self.build_solution(self.best_assignment)
+            return
+
+        # Prune this path as it cannot improve the best solution
+        if self.prune(depth, 0, total):
+            return
+
+        var = self.order[depth]
+        values = self.values[var]
+        live = self.live[var]
+        best = self.scores[var][lowest_bit(live)] if live else 0
+        self.remaining_best -= best
+
+        # Every value left is consistent, forward checking removed the rest
+        while live:
+            position = lowest_bit(live)
+            live &= live - 1
+            mask, value_score, index = values[position]
+            # The values are sorted, so none of the next values can beat
+            # the best solution either, forward checking only lowers the bound
+            if total + value_score + self.remaining_best <= self.best_score:
+                self.pruned["sum"] += 1
+                break
+            trail = self.forward_check(depth, self.value_units[var][position])
+            assignment.append((var, index))
+
+            if self.logging:
+                logger.info(f"ITERATION {self.iteration}: {assignment}")
+                self.iteration += 1
+
+            yield from self.backtrack_forward(
+                depth + 1, total + value_score, assignment
+            )
+            assignment.pop()
+            self.undo(trail)
+
+        # If the domain is empty, add the variable without a value
+        if not self.live[var]:
+            assignment.append((var, None))
+            yield from self.backtrack_forward(depth + 1, total, assignment)
+            assignment.pop()
+
+        self.remaining_best += best
+
+    def forward_check(self, depth: int, units: tuple[int, ...]) -> list:
+        """
+        Remove the values that use any of the units from the domains
+        of the variables after `depth` in the order.
+
+        Parameters
+        ----------
+        depth : int
+            The position in `order` of the assigned variable.
+        units : tuple[int, ...]
+            The unit bits of the assigned value.
+
+        Returns
+        -------
+        list[tuple[int, int, int]]
+            The undo trail with the variable, its previous domain and
+            how much the best legal score of the variable dropped.
+        """
+        trail = []
+        for var in self.order[depth + 1 :]:
+            live = self.live[var]
+            if not live:
+                continue
+            conflicts = 0
+            unit_values = self.unit_values[var]
+            for unit in units:
+                conflicts |= unit_values.get(unit, 0)
+            if not live & conflicts:
+                continue
+            legal = live & ~conflicts
+            self.live[var] = legal
+            # The values are sorted, so the best legal value is the lowest
+            # bit and the bound only changes if that bit was removed
+            drop = 0
+            if live & -live & conflicts:
+                scores = self.scores[var]
+                drop = scores[lowest_bit(live)] - (
+                    scores[lowest_bit(legal)] if legal else 0
+                )
+                self.remaining_best -= drop
+            trail.append((var, live, drop))
+        return trail
+
+    def undo(self, trail: list[tuple[int, int, int]]):
+        """
+        Restore the domains removed by `forward_check`.
+
+        Parameters
+        ----------
+        trail : list[tuple[int, int, int]]
+            The undo trail from `forward_check`.
+        """
+        for var, live, drop in trail:
+            self.live[var] = live
+            self.remaining_best += drop
+
+    def prune(self, depth: int, used: int, total: int) -> bool:
+        """
+        Check if any bound proves the path can't beat the best solution.
+
+        Parameters
+        ----------
+        depth : int
+            The position in `order` of the next variable to assign.
+        used : int
+            The mask with all units used by the assignment.
+        total : int
+            The total score of the assignment.
+
+        Returns
+        -------
+        bool
+            True if the path should be pruned, otherwise False.
+        """
+        for bound in self.bounds:
+            if total + bound.estimate(self, depth, used) <= self.best_score:
+                self.pruned[bound.name] += 1
+                return True
+        return False
+
+    def legal_values(self, var: int, used: int) -> int:
+        """
+        The values of a variable that don't use any of the used units.
+
+        Parameters
+        ----------
+        var : int
+            The variable index.
+        used : int
+            The mask with all units used by the assignment, only needed
+            without forward checking.
+
+        Returns
+        -------
+        int
+            The legal values as a bitset over the positions in `values`.
+        """
+        if self.forward_checking:
+            return self.live[var]
+        legal = 0
+        for position, (mask, _, _) in enumerate(self.values[var]):
+            if not mask & used:
+                legal |= 1 << position
+        return legal
+
+    def best_live_score(self, var: int, live: int) -> int:
+        """
+        The score of the best legal value in a domain.
+
+        Parameters
+        ----------
+        var : int
+            The variable index.
+        live : int
+            The legal values of the variable as a bitset.
+
+        Returns
+        -------
+        int
+            The best score, or 0 if the domain is empty.
+        """
+        return self.scores[var][lowest_bit(live)] if live else 0
+
+    def save_solution(self, total: int, assignment: list):
+        """
+        Save the assignment if it is the best solution found.
+
+        Parameters
+        ----------
+        total : int
+            The total score of the assignment.
+        assignment : list
+            A list of tuples with the variable and counter index.
+
+        Returns
+        -------
+        bool
+            True if the assignment is the new best solution.
+        """
+        if total > self.best_score:
+            self.best_score = total
+            self.max_total_win_rate = total / 100
+            self.best_assignment = tuple(assignment)
+            return True
+        return False
+
+    def build_solution(self, assignment: tuple) -> list[tuple[int, dict]]:
+        """
+        Build the solution in the same format as `CSP.solve`.
+
+        Parameters
+        ----------
+        assignment : tuple
+            A tuple with the variable and counter index for each variable.
+
+        Returns
+        -------
+        list[tuple[int, dict]]
+            A list of tuples with the variable index and the domain,
+            with the assigned counter as "best_team".
+        """
+        solution = []
+        for var, index in assignment:
+            domain = self.domain[var]
+            if index is None:
+                best_team = {"attack": [], "win_rate": 0}
+            else:
+                best_team = domain["counters"][index]
+            solution.append((var, {**domain, "best_team": best_team}))
+        return solution
+
+
+def lowest_bit(bits: int) -> int:
+    """
+    The position of the lowest set bit.
+
+    Parameters
+    ----------
+    bits : int
+        A non zero bitset.
+
+    Returns
+    -------
+    int
+        The position of the lowest set bit.
+    """
+    return (bits & -bits).bit_length() - 1
+
+
+def score(win_rate: float) -> int:
+    """
+    Convert a win rate to an integer score, so totals can be compared
+    without any floating point errors.
+
+    Parameters
+    ----------
+    win_rate : float
+        The win rate, with at most two decimals.
+
+    Returns
+    -------
+    int
+        The win rate multiplied by 100.
+    """
+    return round(win_rate * 100)
+
+
+SOLVERS = {
+    "csp": CSP,
+    "bitmask": BitmaskCSP,
+    "packing": SetPackingSolver,
+}
+
+
+def calculate(
+    data: dict,
+    solver: str = "bitmask",
+    report: dict | None = None,
+    on_solution: Callable[[list], None] | None = None,
+    **options,
+):
+    """
+    Calculate the best attack team for each defense team.
+
+    :param data: Dictionary with the transformed data, zones with teams
+    :param solver: The name of the solver in SOLVERS
+    :param report: Optional dictionary that is filled with the search stats
+    :param on_solution: Optional function that is called with each improved
+        solution, only the solvers with iter_solutions find more than one,
+        the others call it once with their solution
+    :param options: Options for the solver, eg. time_limit, only the
+        options of the solver class are accepted
+    :return: List with the solution
+    :raises ValueError: If the solver is unknown or doesn't have an option
+    """
 
     # Creation of variables with index for each def team
     variables = []
@@ -369,7 +1197,43 @@ def calculate(data: dict):
     ]
     logger.info(f"Domains Created")
 
-    csp = CSP(variables=variables, domains=domain, logging=False)
-    sol = csp.solve()
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver: {solver}")
+    # Eg. the time_limit of the bitmask solver, that the csp solver doesn't have
+    supported = set(inspect.signature(SOLVERS[solver]).parameters)
+    supported -= {"variables", "domains", "logging"}
+    unsupported = sorted(set(options) - supported)
+    if unsupported:
+        raise ValueError(
+            f"The {solver} solver doesn't support the options: {', '.join(unsupported)}"
+        )
+
+    csp = SOLVERS[solver](
+        variables=variables, domains=domain, logging=False, **options
+    )
+    if on_solution is not None and hasattr(csp, "iter_solutions"):
+        for sol in csp.iter_solutions():
+            on_solution(sol)
+        sol = csp.solution
+    else:
+        sol = csp.solve()
+        if on_solution is not None:
+            on_solution(sol)
+
+    stats = {"optimal": True, "max_total_win_rate": csp.max_total_win_rate}
+    if isinstance(csp, (BitmaskCSP, SetPackingSolver)):
+        logger.info(f"Nodes explored: {csp.nodes}, pruned by bound: {csp.pruned}")
+        stats.update({"optimal": csp.optimal, "nodes": csp.nodes, "pruned": csp.pruned})
+    if isinstance(csp, BitmaskCSP):
+        reduction = csp.reduction
+        logger.info(
+            f"Dominated counters removed - values: {reduction['values_before']}"
+            f" -> {reduction['values_after']}, search space:"
+            f" 10^{reduction['search_space_before']:.1f}"
+            f" -> 10^{reduction['search_space_after']:.1f}"
+        )
+        stats["reduction"] = reduction
+    if report is not None:
+        report.update(stats)
 
     return sol
@@ -0,0 +1,92 @@
+"""
+# Dominance pruning
+
+A counter is dominated if another counter of the same defense team has at
+least the same win rate and uses the same units, or a subset of them. Any
+solution with the dominated counter is at most as good as the one with the
+other counter, so the dominated counters are removed before the search and
+the domains are smaller.
+
+With `exact`, only the counters with the exact same units as a better one
+are removed. Their subtrees in the search are the same as the better one,
+so the solution doesn't change at all. A counter with a subset of the units
+frees units for the other teams, and since every team that still has a
+legal counter gets one, that can change which teams are filled. So the
+subset dominance and the cap of the domain sizes are only used without
+`exact`.
+
+"""
+
+import math
+
+
+def reduce_values(
+    values: list[tuple[int, int, int]],
+    exact: bool = True,
+    max_values: int | None = None,
+) -> tuple[list[tuple[int, int, int]], dict[int, int]]:
+    """
+    Remove the dominated values of a domain.
+
+    Parameters
+    ----------
+    values : list[tuple[int, int, int]]
+        The (mask, score, counter index) of each value, the highest score
+        first, same as `BitmaskCSP.values`.
+    exact : bool, optional
+        Only remove the values with the same units as a better value, so
+        the solution is the same, by default True.
+    max_values : int | None, optional
+        Keep at most this many values, the highest scores. Only used
+        without `exact`, by default no limit.
+
+    Returns
+    -------
+    tuple[list[tuple[int, int, int]], dict[int, int]]
+        The values that are kept, in the same order, and the counter index
+        of the value that replaces each removed dominated value.
+    """
+    kept: list[tuple[int, int, int]] = []
+    replaced: dict[int, int] = {}
+    by_mask: dict[int, int] = {}
+    for mask, value_score, index in values:
+        # The values are sorted, so a kept value has the same or a higher score
+        if mask in by_mask:
+            replaced[index] = by_mask[mask]
+            continue
+        if not exact:
+            dominating = next(
+                (
+                    kept_index
+                    for kept_mask, _, kept_index in kept
+                    if not kept_mask & ~mask
+                ),
+                None,
+            )
+            if dominating is not None:
+                replaced[index] = dominating
+                continue
+        by_mask[mask] = index
+        kept.append((mask, value_score, index))
+
+    if not exact and max_values is not None:
+        kept = kept[:max_values]
+    return kept, replaced
+
+
+def search_space(sizes: list[int]) -> float:
+    """
+    The size of the search space, as log10 of the product of the domain
+    sizes, where a team without a counter counts as one.
+
+    Parameters
+    ----------
+    sizes : list[int]
+        The number of values of each domain.
+
+    Returns
+    -------
+    float
+        The log10 of the number of complete assignments.
+    """
+    return sum(math.log10(size) for size in sizes if size > 1)
@@ -1,6 +1,49 @@
+from collections import OrderedDict
+from urllib.parse import urlsplit
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import httpx
 import requests
 
-BASE_URL = "https://swgoh.gg/api/"
+# Can be set to a local server, eg. for testing
+BASE_URL = os.environ.get("SWGOH_API_URL", "https://swgoh.gg/api/")
+
+# Seconds the response of each endpoint is used before it's revalidated,
+# the game data only changes with game updates but rosters change daily
+CACHE_TTL = {
+    "abilities": 24 * 60 * 60,
+    "characters": 24 * 60 * 60,
+    "stat-definitions": 24 * 60 * 60,
+    "datacron-sets": 24 * 60 * 60,
+    "datacron-templates": 24 * 60 * 60,
+    "datacron-affix-template-sets": 24 * 60 * 60,
+    "player": 10 * 60,
+}
+
+# Maximum number of responses in memory
+CACHE_SIZE = 128
+
+# Directory to also store the responses on disk, only in memory if not set
+CACHE_DIR = os.environ.get("SWGOH_CACHE_DIR")
+
+_cache: OrderedDict[str, dict] = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Async client, shared so the connections are kept alive between requests
+TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+MAX_CONNECTIONS = 20
+# Maximum number of concurrent requests to the same host
+HOST_CONCURRENCY = 5
+# Number of retries of a failed request, with exponential backoff
+RETRIES = 3
+BACKOFF = 0.5
+
+_client: httpx.AsyncClient | None = None
+_host_limits: dict[str, asyncio.Semaphore] = {}
 
 """
 /api/units/
@@ -15,6 +58,194 @@ BASE_URL = "https://swgoh.gg/api/"
 """
 
 
+def get_json(path: str):
+    """
+    Returns the JSON data of an endpoint, from the cache if it's not expired
+
+    An expired response is revalidated with its ETag and Last-Modified,
+    so the data is only sent again if it changed. If the request fails or
+    times out, the expired response is used.
+
+    Args:
+        path(str): Path of the endpoint, after BASE_URL
+    """
+    url = BASE_URL + path
+    entry = _read_cache(url)
+    if entry is not None and entry["expires"] > time.time():
+        return entry["data"]
+
+    try:
+        response = requests.get(
+            url=url,
+            headers=_revalidation_headers(entry),
+            timeout=(TIMEOUT.connect, TIMEOUT.read),
+        )
+    except requests.RequestException:
+        # Use the expired response if the host can't be reached
+        if entry is not None:
+            return entry["data"]
+        raise
+    return _handle_response(path, response, entry)
+
+
+async def get_json_async(path: str):
+    """
+    Same as get_json, but with the shared async client
+
+    The requests to a host are limited to HOST_CONCURRENCY at a time, and
+    a request that times out, fails to connect or gets a 429 or 5xx status
+    is retried RETRIES times with exponential backoff.
+
+    Args:
+        path(str): Path of the endpoint, after BASE_URL
+    """
+    url = BASE_URL + path
+    entry = _read_cache(url)
+    if entry is not None and entry["expires"] > time.time():
+        return entry["data"]
+
+    client = get_client()
+    host = urlsplit(url).netloc
+    if host not in _host_limits:
+        _host_limits[host] = asyncio.Semaphore(HOST_CONCURRENCY)
+
+    async with _host_limits[host]:
+        for attempt in range(RETRIES + 1):
+            try:
+                response = await client.get(url, headers=_revalidation_headers(entry))
+                if response.status_code != 429 and response.status_code < 500:
+                    break
+            except httpx.TransportError:
+                if attempt == RETRIES:
+                    # Use the expired response if the host can't be reached
+                    if entry is not None:
+                        return entry["data"]
+                    raise
+            if attempt < RETRIES:
+                await asyncio.sleep(BACKOFF * 2**attempt)
+
+    return _handle_response(path, response, entry)
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Returns the shared async client, it's created on the first call
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """
+    Closes the shared async client and its connections
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _host_limits.clear()
+
+
+def _revalidation_headers(entry: dict | None) -> dict:
+    """
+    Returns the headers to only get the response if it changed since the entry
+    """
+    headers = {}
+    if entry is not None:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def _handle_response(path: str, response, entry: dict | None):
+    """
+    Returns the data of a requests or httpx response, and caches it
+    """
+    if response.status_code == 304 and entry is not None:
+        data = entry["data"]
+    elif response.status_code < 400:
+        data = response.json()
+    elif entry is not None:
+        return entry["data"]
+    else:
+        return response.json()
+
+    ttl = CACHE_TTL.get(path.split("/")[0], 0)
+    _write_cache(
+        BASE_URL + path,
+        {
+            "data": data,
+            "expires": time.time() + ttl,
+            "etag": response.headers.get("ETag", entry and entry["etag"]),
+            "last_modified": response.headers.get(
+                "Last-Modified", entry and entry["last_modified"]
+            ),
+        },
+    )
+    return data
+
+
+def _cache_path(url: str) -> str:
+    return os.path.join(CACHE_DIR, hashlib.sha1(url.encode()).hexdigest() + ".json")
+
+
+def _read_cache(url: str) -> dict | None:
+    """
+    Returns the cached response of the URL, from memory or disk
+    """
+    with _cache_lock:
+        if url in _cache:
+            _cache.move_to_end(url)
+            return _cache[url]
+    if CACHE_DIR is None or not os.path.exists(_cache_path(url)):
+        return None
+    with open(_cache_path(url), "r") as f:
+        entry = json.load(f)
+    _remember(url, entry)
+    return entry
+
+
+def _write_cache(url: str, entry: dict) -> None:
+    """
+    Stores the response of the URL in memory, and on disk if CACHE_DIR is set
+    """
+    _remember(url, entry)
+    if CACHE_DIR is None:
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Write to a temporary file first, so a reader never sees half a file
+    path = _cache_path(url)
+    with open(path + ".tmp", "w") as f:
+        json.dump(entry, f)
+    os.replace(path + ".tmp", path)
+
+
+def _remember(url: str, entry: dict) -> None:
+    with _cache_lock:
+        _cache[url] = entry
+        _cache.move_to_end(url)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def clear_cache() -> None:
+    """
+    Removes all responses from the memory cache
+    """
+    with _cache_lock:
+        _cache.clear()
+
+
 def get_all_abilities() -> list[dict]:
     """
     Returns list with dictionraies of character abilities
@@ -37,8 +268,7 @@ def get_all_abilities() -> list[dict]:
         ship_base_id(str | None): Ship base ID
         omicron_batle_types(list): Omicron battle types
     """
-    response = requests.get(url=BASE_URL + "abilities")
-    data = response.json()
+    data = get_json("abilities")
     return data
 
 
@@ -63,8 +293,7 @@ def get_all_characters() -> list[dict]:
         ship_slot(int): Ship slot
         activate_shard_count(int): Shard count
     """
-    response = requests.get(url=BASE_URL + "characters")
-    data = response.json()
+    data = get_json("characters")
     return data
 
 
@@ -90,8 +319,7 @@ def get_stat_definitions() -> list[dict]:
         ship_base_id(str | None): Ship base ID
         omicron_batle_types(list): Omicron battle types
     """
-    response = requests.get(url=BASE_URL + "stat-definitions")
-    data = response.json()
+    data = get_json("stat-definitions")
     return data
 
 
@@ -107,26 +335,37 @@ def get_player_data(ally_code: str) -> dict:
     """
     # Remove any dashes from the ally code
     ally_code = ally_code.replace("-", "")
-    response = requests.get(url=BASE_URL + f"player/{ally_code}")
-    data = response.json()
+    data = get_json(f"player/{ally_code}")
     return data
 
 
+async def get_all_characters_async() -> list[dict]:
+    """
+    Same as get_all_characters, but with the shared async client
+    """
+    return await get_json_async("characters")
+
+
+async def get_player_data_async(ally_code: str) -> dict:
+    """
+    Same as get_player_data, but with the shared async client
+    """
+    ally_code = ally_code.replace("-", "")
+    return await get_json_async(f"player/{ally_code}")
+
+
 def get_datacron_sets():
-    response = requests.get(url=BASE_URL + "datacron-sets")
-    data = response.json()
+    data = get_json("datacron-sets")
     return data
 
 
 def get_datacron_templates():
-    response = requests.get(url=BASE_URL + "datacron-templates")
-    data = response.json()
+    data = get_json("datacron-templates")
     return data
 
 
 def get_datacron_affix_template_sets():
-    response = requests.get(url=BASE_URL + "datacron-affix-template-sets")
-    data = response.json()
+    data = get_json("datacron-affix-template-sets")
     return data
 
 
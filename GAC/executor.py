@@ -0,0 +1,342 @@
+"""
+# Solver executor
+
+The solver is CPU bound, so it runs in a pool of worker processes instead
+of the event loop of the web app. The pool only takes a limited number of
+jobs, the running ones plus a bounded queue, and rejects the others, so
+the waiting time of an accepted job stays predictable.
+
+Each worker process has its own memory, so the solution cache is used in
+the app process, before a round is sent to the pool and after the result
+comes back, see `lookup_attack_teams` and `store_attack_teams`.
+
+"""
+
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+
+from .main import (
+    cache_solution,
+    cached_solution,
+    main,
+    round_key,
+    transform_solution,
+)
+
+
+class SolverBusy(Exception):
+    """
+    Raised when the solver pool has no room for another job.
+    """
+
+
+class SolverPool:
+    """
+    A pool of solver workers with a bounded queue.
+
+    Attributes
+    ----------
+    workers : int
+        The number of jobs that run at the same time.
+    queue_size : int
+        The number of jobs that can wait for a worker.
+    pending : int
+        The number of running and waiting jobs.
+    processes : bool
+        True if the jobs run in processes, otherwise in threads.
+
+    """
+
+    def __init__(
+        self, workers: int | None = None, queue_size: int = 16, processes: bool = True
+    ):
+        """
+        Constructs all the necessary attributes for the SolverPool object.
+
+        Parameters
+        ----------
+        workers : int | None, optional
+            The number of jobs that run at the same time, by default the
+            number of CPUs.
+        queue_size : int, optional
+            The number of jobs that can wait for a worker, by default 16.
+        processes : bool, optional
+            Run the jobs in processes, otherwise in threads which share
+            the caches but not the CPUs, by default True.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.pending = 0
+        self.processes = processes
+        self.lock = threading.Lock()
+        self.manager = None
+        self.executor: Executor
+        if processes:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        Submit a job to the pool.
+
+        Parameters
+        ----------
+        fn : callable
+            The function to run, it must be picklable if the pool runs
+            the jobs in processes.
+
+        Returns
+        -------
+        Future
+            The future of the job.
+
+        Raises
+        ------
+        SolverBusy
+            If all the workers are busy and the queue is full.
+        """
+        with self.lock:
+            if self.pending >= self.workers + self.queue_size:
+                raise SolverBusy()
+            self.pending += 1
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+        except BaseException:
+            self.release()
+            raise
+        future.add_done_callback(lambda _: self.release())
+        return future
+
+    def release(self):
+        """
+        Free the place of a finished job.
+        """
+        with self.lock:
+            self.pending -= 1
+
+    async def run(self, fn, *args, timeout: float | None = None, **kwargs):
+        """
+        Run a job in the pool and wait for the result, without blocking
+        the event loop.
+
+        Parameters
+        ----------
+        fn : callable
+            The function to run.
+        timeout : float | None, optional
+            The maximum number of seconds to wait, by default no limit.
+
+        Returns
+        -------
+        object
+            The result of the function.
+
+        Raises
+        ------
+        SolverBusy
+            If all the workers are busy and the queue is full.
+        asyncio.TimeoutError
+            If the job didn't finish in time. A waiting job is cancelled,
+            a running one keeps its place until it's done.
+        """
+        future = self.submit(fn, *args, **kwargs)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+
+    def stream(self, fn, *args, timeout: float | None = None, **kwargs):
+        """
+        Run a job in the pool, and iterate over the solutions it finds.
+
+        The job is submitted right away, so a full pool raises here and
+        not when the iteration starts.
+
+        Parameters
+        ----------
+        fn : callable
+            The function to run, it gets an `on_solution` callback that
+            sends a solution to the iterator.
+        timeout : float | None, optional
+            The maximum number of seconds to wait, by default no limit.
+
+        Returns
+        -------
+        AsyncIterator[tuple[str, object]]
+            ("solution", solution) for each solution, and then ("done",
+            result) with the result of the function.
+
+        Raises
+        ------
+        SolverBusy
+            If all the workers are busy and the queue is full.
+        """
+        events = self.shared_queue()
+        future = self.submit(fn, *args, on_solution=events.put, **kwargs)
+        return self.iter_events(future, events, timeout)
+
+    async def iter_events(self, future: Future, events, timeout: float | None):
+        """
+        Yield the solutions of a job from `stream`, until the job is done.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            If the job didn't finish in time.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        waiter = asyncio.wrap_future(future)
+        try:
+            while True:
+                # The job is checked before the queue, so no solution that
+                # is sent before the job is done is missed
+                done = future.done()
+                try:
+                    while True:
+                        yield "solution", events.get_nowait()
+                except queue.Empty:
+                    pass
+                if done:
+                    break
+                if deadline is not None and loop.time() > deadline:
+                    raise asyncio.TimeoutError()
+                await asyncio.wait([waiter], timeout=0.1)
+            yield "done", future.result()
+        finally:
+            # Cancel the job if it's still waiting, eg. the client left
+            future.cancel()
+
+    def shared_dict(self) -> dict:
+        """
+        A dictionary that a job can update, also from a worker process.
+
+        Returns
+        -------
+        dict
+            A `multiprocessing.Manager` dict if the pool runs processes,
+            otherwise a plain dict.
+        """
+        if not self.processes:
+            return {}
+        return self.get_manager().dict()
+
+    def shared_queue(self):
+        """
+        A queue that a job can put to, also from a worker process.
+
+        Returns
+        -------
+        queue.Queue
+            A `multiprocessing.Manager` queue if the pool runs processes,
+            otherwise a plain queue.
+        """
+        if not self.processes:
+            return queue.Queue()
+        return self.get_manager().Queue()
+
+    def get_manager(self):
+        """
+        The manager of the shared objects, it's started on the first call.
+        """
+        with self.lock:
+            if self.manager is None:
+                self.manager = multiprocessing.Manager()
+            return self.manager
+
+    def shutdown(self):
+        """
+        Cancel the waiting jobs and stop the workers.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.manager is not None:
+            self.manager.shutdown()
+            self.manager = None
+
+
+def lookup_attack_teams(**kwargs) -> tuple[str, tuple[dict, dict] | None]:
+    """
+    Look up a round in the solution cache of this process, before it's sent
+    to the pool.
+
+    Parameters
+    ----------
+    kwargs
+        The arguments for `GAC.main.main`, with the player_characters.
+
+    Returns
+    -------
+    tuple[str, tuple[dict, dict] | None]
+        The key of the round, and the result and the search stats of the
+        cached solution, same as `solve_attack_teams`, or None.
+    """
+    fingerprint = round_key(
+        mode=kwargs["mode"],
+        gac_round=kwargs["gac_round"],
+        min_gear_level=kwargs["min_gear_level"],
+        focus_zone=kwargs["focus_zone"],
+        player_characters=kwargs["player_characters"],
+        solver_options=kwargs.get("solver_options"),
+    )
+    cached = cached_solution(fingerprint)
+    if cached is None:
+        return fingerprint, None
+    solution, stats = cached
+    opponent = kwargs["gac_round"]["opponent"]
+    return fingerprint, (transform_solution(data=opponent, solution=solution), stats)
+
+
+def store_attack_teams(fingerprint: str, result: tuple[dict, dict]):
+    """
+    Add the solution of a round from the pool to the solution cache of
+    this process, if it's proven the best.
+
+    Parameters
+    ----------
+    fingerprint : str
+        The key of the round, from `lookup_attack_teams`.
+    result : tuple[dict, dict]
+        The result and the search stats from `solve_attack_teams`.
+    """
+    teams, report = result
+    # The defense and the best team of each team is all `transform_solution`
+    # needs, so the domains of the solver are not sent back from the worker
+    solution = [
+        (index, {"defense": team["defense"], "best_team": team["best_team"]})
+        for index, team in enumerate(
+            team for zone in teams for team in teams[zone] if "best_team" in team
+        )
+    ]
+    cache_solution(fingerprint, solution, report)
+
+
+def solve_attack_teams(progress=None, **kwargs) -> tuple[dict, dict]:
+    """
+    Run `GAC.main.main` and return the search stats with the result, as a
+    report filled in a worker process is not seen by the caller.
+
+    The solution cache of the worker is not used, the caller looks up and
+    stores the round in its own process, see `lookup_attack_teams`.
+
+    Parameters
+    ----------
+    progress : Callable[[dict], None] | None, optional
+        Called with the status and the search progress, it must be
+        picklable if the pool runs the jobs in processes, eg. the update
+        method of a `multiprocessing.Manager` dict. By default None.
+
+    Returns
+    -------
+    tuple[dict, dict]
+        The opponent data with the best team for each defense team, and
+        the search stats.
+    """
+    if progress is not None:
+        progress({"status": "running"})
+        solver_options = kwargs.get("solver_options") or {}
+        kwargs["solver_options"] = {**solver_options, "progress": progress}
+    report: dict = {}
+    result = main(report=report, use_cache=False, **kwargs)
+    return result, report
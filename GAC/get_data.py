@@ -1,5 +1,7 @@
 from bs4 import BeautifulSoup
 from endpoints import get_all_characters
+from journal import Journal, journal_path
+from scraper import SITE_URL, PageCache, scrape_counters
 from utils import (
     write_to_file,
     get_all_scraped_seasons,
@@ -8,8 +10,8 @@ from utils import (
 )
 from printinglog import Logger
 from tqdm import tqdm
+import os
 import requests
-import re
 from time import sleep
 
 logger = Logger(format="simple")
@@ -41,113 +43,36 @@ def get_page(url):
     return soup
 
 
-def get_all_counters_for_team(leader: str, url: str) -> list[dict[str, list[str]]]:
+def run(
+    concurrency: int | None = None,
+    rate: float | None = None,
+    resume: bool = True,
+    refresh: bool = False,
+):
     """
-    Get all the counters from the given URL for the team(leader)
+    Scrape the counters of the new seasons, the leaders are scraped at the
+    same time, see `scraper.Scraper`. Each scraped leader is saved in the
+    journal of the season, so a failed run can be resumed.
+
+    The metadata of the pages is kept in GAC/data/pages.json, so a season
+    that is scraped again only downloads and parses the changed pages.
 
     Parameters:
     ----------
-    leader: str
-        Leader of the team
-
-    url: str
-        URL to the page with the counters
-
-    Returns:
-    -------
-    counters: list[dict[str, list[str]]]
-        List of counters for the team(leader)
-
-    """
-
-    # Get the page HTML as soup
-    soup = get_page(url)
-    counters: list = []
-
-    # Iterate through all the counter cards
-    # Each counter card has a list of characters
-    # It starts with the counter and ends with the defense
-    for counter in soup.find_all("div", {"class": "paper paper--size-sm"}):
-
-        # Variables for each counter card
-        a_team: list[str] = []  # Attack team
-        d_team: list[str] = [leader]  # Defense team
-        win_rate = 0
-        avg_banners = 0.0
-        seen = 0
-
-        # Gets all the characters in the counter card
-        # Each <a> tag has a url with the character name
-        characters = counter.find_all("a")
-        # Iterate through all the urls with the character names
-        for character_ref in characters:
-            character = character_ref.get("href")
-            # URL could look like this:
-            # ..CHAMPIONSHIPS_GRAND_ARENA_GA2_EVENT_SEASON_55&d_member=SEVENTHSISTER
-            # Hence we split the url by "&" and then by "=" to get the character name
-            member, name = character.split("&")[1].split("=")
-
-            # Position is either a (attack) or d (defense)
-            # and either lead or member.
-            if member[0] == "a":
-                a_team.append(name)
-            elif member[0] == "d":
-                d_team.append(name)
-
-        # Get the win rate and win history data of the counter
-        data = counter.find_all("div", {"class": "flex-1"})
-
-        # Iterate through each div in the data
-        for d in data:
-            # Strip the line of all whitespace
-            line = d.get_text(strip=True)
-            # If the line starts with "Win" it is the win rate
-            if line.startswith("Win"):
-                # Remove all non-digits from the line, eg. %99% -> 99
-                win_rate = int(re.sub(r"\D", "", line))
-            # If the line starts with "Avg" it is the average banners
-            elif line.startswith("Avg"):
-                # Remove the "Avg" from the line, eg. Avg 50 -> 50
-                avg_banners = float(line.strip("Avg"))
-            # If the line starts with "Seen" it is the value of times counter been seen
-            elif line.startswith("Seen"):
-                seen_raw = line.strip("Seen")
-                # First line will be the complete string, add last time
-                if not "Win" in seen_raw:
-                    # eg. 1,327 -> 1327
-                    seen_raw = seen_raw.replace(",", "")
-                    # eg. 11.3K -> 11300
-                    seen_raw = seen_raw.replace(".", "")
-                    seen_raw = seen_raw.replace("K", "00")
-                    # Save the value as an integer
-                    seen = int(seen_raw)
-
-        # Append the counter to the list of counters
-        counters.append(
-            {
-                "attack": a_team,
-                "defense": d_team,
-                "win_rate": win_rate,
-                "avg_banners": avg_banners,
-                "seen": seen,
-            }
-        )
+    concurrency: int | None
+        Number of leaders scraped at the same time, by default CONCURRENCY
 
-    # If there is a next page, get the counters from the next page
-    pagination = soup.find_all("a", {"class": "pagination__link"})
-    if pagination:
-        next = pagination[-1].get_text(strip=True)
-        if next == "Next":
-            # Get the next page URL
-            next_page = "https://swgoh.gg/" + pagination[-1].get("href")
-            # Get all counters from the next page
-            counters += get_all_counters_for_team(leader, next_page)
+    rate: float | None
+        Maximum requests per second, by default RATE
 
-    return counters
+    resume: bool
+        Skip the leaders in the journal of a failed run, otherwise the
+        journal is removed and the season starts over
 
+    refresh: bool
+        Scrape the latest scraped season again, eg. to check for new
+        counters every day while the season is running
 
-def run():
-    """
     Each counter in gac_counters contains the following data:
 
     {
@@ -164,13 +89,18 @@ def run():
     """
 
     # Base URL for the counter pages
-    base_url = "https://swgoh.gg/gac/counters/"
+    base_url = f"{SITE_URL}gac/counters/"
+    options = {
+        key: value
+        for key, value in {"concurrency": concurrency, "rate": rate}.items()
+        if value is not None
+    }
 
     # Get the latest scraped season
     oldest_season = max(get_all_scraped_seasons())
 
     # Get the latest season
-    soup = get_page(url="https://swgoh.gg/gac/counters/")
+    soup = get_page(url=base_url)
     latest_season = max(
         [
             int(
@@ -182,37 +112,94 @@ def run():
         ]
     )
 
-    if oldest_season == latest_season:
+    if oldest_season == latest_season and not refresh:
         logger.info("No new seasons to scrape")
+        return
+
+    # Metadata of the pages from the last runs
+    cache = PageCache(os.path.join(os.getcwd(), "GAC/data/pages.json"))
+    options["cache"] = cache
 
     # Scrape all seasons from the oldest to the latest
-    for season in range(oldest_season + 1, latest_season + 1):
+    first_season = oldest_season if refresh else oldest_season + 1
+    try:
+        teams = scrape_seasons(
+            range(first_season, latest_season + 1), base_url, resume, options
+        )
+    except BaseException:
+        cache.save()
+        raise
+    # Only the pages of the seasons that are scraped now are needed later
+    cache.save(teams=teams)
 
-        # Dictionary to store all counters
-        gac_counters = {}
+
+def scrape_seasons(
+    seasons: range, base_url: str, resume: bool, options: dict
+) -> set[str]:
+    """
+    Scrape all the counters of the seasons, and write each season to its file
+
+    Parameters:
+    ----------
+    seasons: range
+        The seasons to scrape
+
+    base_url: str
+        Base URL for the counter pages
+
+    resume: bool
+        Skip the leaders in the journal of a failed run
+
+    options: dict
+        The options of the Scraper
+
+    Returns:
+    -------
+    teams: set[str]
+        The URL to the first counter page of each scraped team
+    """
+    teams: set[str] = set()
+    for season in seasons:
 
         # 1. Set the latest GAC SEASON url.
         season_id = f"CHAMPIONSHIPS_GRAND_ARENA_GA2_EVENT_SEASON_{season}"
 
+        # Journal with the leaders that are already scraped
+        journal = Journal(journal_path(season))
+        if not resume:
+            journal.remove()
+
         # 2. Get all available characters from the API
         all_characters = get_all_characters()
 
         # 3. Get all counters for each team(leader).
-        for character_data in tqdm(
-            all_characters, desc=f"Scraping GAC Season {season} ", colour="green"
-        ):
-            # Get the base ID of the character
-            character = character_data["base_id"]
-            # Create the URL for the counter
-            counter_link = f"{base_url}{character}/?season_id={season_id}"
-            # URL: https://swgoh.gg/gac/counters/DARTHTRAYA/?season_id=CHAMPIONSHIPS_GRAND_ARENA_GA2_EVENT_SEASON_
-            # Get all counters for the team(leader)
-            gac_counters[character] = get_all_counters_for_team(
-                leader=character, url=counter_link
+        # URL: https://swgoh.gg/gac/counters/DARTHTRAYA/?season_id=CHAMPIONSHIPS_GRAND_ARENA_GA2_EVENT_SEASON_
+        counter_links = {
+            character_data["base_id"]: (
+                f"{base_url}{character_data['base_id']}/?season_id={season_id}"
+            )
+            for character_data in all_characters
+        }
+        teams.update(counter_links.values())
+        with tqdm(
+            total=len(counter_links),
+            desc=f"Scraping GAC Season {season} ",
+            colour="green",
+        ) as progress_bar:
+            # Dictionary with all counters, by the leader
+            gac_counters = scrape_counters(
+                counter_links,
+                progress=lambda _: progress_bar.update(),
+                journal=journal,
+                **options,
             )
 
         # 4. Save the data to the correct folder
-        if (max(get_3v3_seasons()) + 1) == season:
+        if season in get_3v3_seasons():
+            location = f"3v3/Season_{season}.json"
+        elif season in get_5v5_seasons():
+            location = f"5v5/Season_{season}.json"
+        elif (max(get_3v3_seasons()) + 1) == season:
             location = f"5v5/Season_{season}.json"
         elif (max(get_5v5_seasons()) + 1) == season:
             location = f"3v3/Season_{season}.json"
@@ -221,6 +208,10 @@ def run():
 
         # Write the data to a file
         write_to_file(gac_counters, location)
+        # The season is complete, the next run doesn't need the journal
+        journal.remove()
+
+    return teams
 
 
 if __name__ == "__main__":
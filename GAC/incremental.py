@@ -0,0 +1,227 @@
+"""
+# Incremental round
+
+During a GAC round the board changes a little at a time, an opponent team
+is eliminated or the player uses an attack team. `IncrementalRound` keeps
+the player units, the transformed domains and the last solution, so an
+update only removes a variable or the used units from the domains and the
+solver is warm started from the last solution.
+
+"""
+
+from .csp import BitmaskCSP
+from .counters import get_counters
+from .main import (
+    SIMILAR_LIMIT,
+    get_all_player_units,
+    transform_data,
+    transform_solution,
+)
+from printinglog import Logger
+import copy
+
+logger = Logger(format="simple")
+
+
+class IncrementalRound:
+    """
+    A GAC round that is solved again after each update.
+
+    Attributes
+    ----------
+    gac_round : dict
+        The opponent, player and used_attack data, with the updates.
+    focus_zone : list[str]
+        The zones to focus on.
+    solver_options : dict
+        The options for BitmaskCSP, eg. time_limit, without the solver.
+    positions : list[tuple[str, int]]
+        The zone and the team index in the opponent data of each variable.
+    variables : list[int]
+        The variables that are not eliminated.
+    domains : list[tuple[int, dict]]
+        The variable index and the domain of each variable.
+    assignment : dict[int, dict | None]
+        The counter of each variable in the last solution.
+
+    """
+
+    def __init__(
+        self,
+        ally_code: str,
+        mode: str,
+        gac_round: dict,
+        min_gear_level: int,
+        focus_zone: list[str],
+        solver_options: dict | None = None,
+    ):
+        """
+        Constructs all the necessary attributes for the IncrementalRound object.
+
+        The player units and the counters are only read here, the updates
+        use the transformed domains.
+
+        Parameters
+        ----------
+        ally_code : str
+            The ally code of the player.
+        mode : str
+            The GAC mode, 3v3 or 5v5.
+        gac_round : dict
+            The opponent, player and used_attack data.
+        min_gear_level : int
+            The minimum gear level of the characters.
+        focus_zone : list[str]
+            The zones to focus on.
+        solver_options : dict | None, optional
+            The options for BitmaskCSP, eg. time_limit, by default None.
+            Only the bitmask solver can be warm started, so the "solver"
+            option of `GAC.csp.calculate` can only be "bitmask".
+
+        Raises
+        ------
+        ValueError
+            If the solver option is not "bitmask".
+        """
+        solver_options = dict(solver_options or {})
+        solver = solver_options.pop("solver", "bitmask")
+        if solver != "bitmask":
+            raise ValueError(
+                f"Only the bitmask solver can solve a round incrementally, not {solver}"
+            )
+        self.gac_round = copy.deepcopy(gac_round)
+        self.focus_zone = focus_zone
+        self.solver_options = solver_options
+        self.assignment: dict[int, dict | None] = {}
+
+        player_characters = get_all_player_units(
+            ally_code=ally_code, min_gear_level=min_gear_level
+        )
+        data_to_calculate = transform_data(
+            data=self.gac_round,
+            counters_data=get_counters(mode),
+            player_characters=player_characters,
+            match_threshold=1,
+            focus=focus_zone,
+            similar_limit=SIMILAR_LIMIT,
+        )
+
+        # Same order as transform_data, which skips the zones that are not
+        # in focus and the empty or eliminated teams
+        opponent = self.gac_round["opponent"]
+        self.positions: list[tuple[str, int]] = [
+            (zone, i)
+            for zone in opponent
+            if zone in focus_zone
+            for i, team in enumerate(opponent[zone])
+            if team["defense"] != [] and not team["eliminated"]
+        ]
+        teams = [team for zone in data_to_calculate for team in data_to_calculate[zone]]
+        self.variables = list(range(len(teams)))
+        self.domains = list(enumerate(teams))
+
+    def eliminate(self, zone: str, index: int):
+        """
+        Eliminate an opponent team, its variable is removed.
+
+        Parameters
+        ----------
+        zone : str
+            The zone of the team.
+        index : int
+            The index of the team in the zone.
+        """
+        self.gac_round["opponent"][zone][index]["eliminated"] = True
+        if (zone, index) not in self.positions:
+            return
+        var = self.positions.index((zone, index))
+        if var in self.variables:
+            self.variables.remove(var)
+        self.assignment.pop(var, None)
+
+    def use_attack(self, team: list[dict]):
+        """
+        Use an attack team, the counters with its units are removed.
+
+        Parameters
+        ----------
+        team : list[dict]
+            The characters of the attack team.
+        """
+        self.gac_round["used_attack"].append(team)
+        used = {character["base_id"] for character in team}
+        self.domains = [
+            (
+                var,
+                {
+                    **domain,
+                    "counters": [
+                        counter
+                        for counter in domain["counters"]
+                        if used.isdisjoint(
+                            character["base_id"] for character in counter["attack"]
+                        )
+                    ],
+                },
+            )
+            for var, domain in self.domains
+        ]
+
+    def solve(self, report: dict | None = None) -> dict:
+        """
+        Solve the round, warm started from the last solution.
+
+        Parameters
+        ----------
+        report : dict | None, optional
+            Dictionary that is filled with the search stats, by default None.
+
+        Returns
+        -------
+        dict
+            The opponent data with the best team for each defense team.
+        """
+        # The counter index of the last solution in the updated domains,
+        # the counters are the same objects so they are found by identity
+        warm_start: dict[int, int | None] = {}
+        for var, domain in self.domains:
+            counter = self.assignment.get(var)
+            warm_start[var] = None
+            for i, candidate in enumerate(domain["counters"]):
+                if candidate is counter:
+                    warm_start[var] = i
+                    break
+
+        csp = BitmaskCSP(
+            self.variables,
+            self.domains,
+            warm_start=warm_start if self.assignment else None,
+            **self.solver_options,
+        )
+        solution = csp.solve()
+        logger.info(
+            f"Incremental solve - nodes: {csp.nodes}, pruned: {csp.pruned}"
+        )
+
+        self.assignment = {}
+        for var, domain in solution:
+            counter = domain["best_team"]
+            self.assignment[var] = counter if counter["attack"] else None
+
+        if report is not None:
+            report.update(
+                {
+                    "optimal": csp.optimal,
+                    "max_total_win_rate": csp.max_total_win_rate,
+                    "nodes": csp.nodes,
+                    "pruned": csp.pruned,
+                }
+            )
+
+        # The best team is added again, so the eliminated teams don't
+        # keep the one from the last solution
+        opponent = copy.deepcopy(self.gac_round["opponent"])
+        for zone in opponent:
+            for team in opponent[zone]:
+                team.pop("best_team", None)
+        return transform_solution(data=opponent, solution=solution)
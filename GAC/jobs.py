@@ -0,0 +1,189 @@
+"""
+# Solver jobs
+
+A hard board can take longer to solve than a client or a proxy waits for
+a response. A job runs the solve in the `SolverPool` in the background,
+and the client polls it for the progress and the result. Finished jobs
+are kept for a while, then removed.
+
+"""
+
+from concurrent.futures import Future
+import threading
+import time
+import uuid
+
+from .executor import (
+    SolverPool,
+    lookup_attack_teams,
+    solve_attack_teams,
+    store_attack_teams,
+)
+
+
+class JobStore:
+    """
+    The solver jobs, by their id.
+
+    Attributes
+    ----------
+    pool : SolverPool
+        The pool the jobs run in.
+    retention : float
+        The number of seconds a finished job is kept.
+    jobs : dict[str, dict]
+        The jobs, with their status, progress and result.
+
+    """
+
+    def __init__(self, pool: SolverPool, retention: float = 15 * 60):
+        """
+        Constructs all the necessary attributes for the JobStore object.
+
+        Parameters
+        ----------
+        pool : SolverPool
+            The pool the jobs run in.
+        retention : float, optional
+            The number of seconds a finished job is kept, by default 15 minutes.
+        """
+        self.pool = pool
+        self.retention = retention
+        self.jobs: dict[str, dict] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, **kwargs) -> str:
+        """
+        Start a job that solves a round.
+
+        The round is fingerprinted and looked up in the solution cache, and
+        the shared progress may start the manager process, so an async
+        caller runs it in a thread, eg. with `asyncio.to_thread`.
+
+        Parameters
+        ----------
+        kwargs
+            The arguments for `GAC.main.main`.
+
+        Returns
+        -------
+        str
+            The id of the job.
+
+        Raises
+        ------
+        SolverBusy
+            If all the workers are busy and the queue is full.
+        """
+        self.purge()
+        # The same round solved before, the workers don't share their caches
+        fingerprint, cached = lookup_attack_teams(**kwargs)
+        if cached is not None:
+            progress: dict = {"status": "done"}
+            future: Future = Future()
+            future.set_result(cached)
+        else:
+            progress = self.pool.shared_dict()
+            progress["status"] = "queued"
+            future = self.pool.submit(
+                solve_attack_teams, progress=progress.update, **kwargs
+            )
+
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            self.jobs[job_id] = {
+                "status": "queued",
+                "progress": progress,
+                "created": time.time(),
+                "finished": None,
+                "result": None,
+                "report": None,
+                "error": None,
+            }
+        future.add_done_callback(
+            lambda future: self.finish(job_id, future, fingerprint)
+        )
+        return job_id
+
+    def finish(self, job_id: str, future: Future, fingerprint: str | None = None):
+        """
+        Store the result or the error of a finished job.
+
+        Parameters
+        ----------
+        job_id : str
+            The id of the job.
+        future : Future
+            The future of the job.
+        fingerprint : str | None, optional
+            The key of the round, the solution is added to the solution
+            cache, by default None.
+        """
+        if fingerprint is not None and not future.cancelled():
+            if future.exception() is None:
+                store_attack_teams(fingerprint, future.result())
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job["finished"] = time.time()
+            if future.cancelled():
+                job["status"] = "cancelled"
+            elif future.exception() is not None:
+                job["status"] = "failed"
+                job["error"] = str(future.exception())
+            else:
+                job["status"] = "done"
+                job["result"], job["report"] = future.result()
+            # The last progress is in the report, the shared dict isn't needed
+            job["progress"] = dict(job["progress"])
+
+    def get(self, job_id: str) -> dict | None:
+        """
+        The status, the progress and the result of a job.
+
+        Parameters
+        ----------
+        job_id : str
+            The id of the job.
+
+        Returns
+        -------
+        dict | None
+            The job, or None if there is no job with the id.
+        """
+        self.purge()
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            progress = dict(job["progress"])
+            status = job["status"]
+            if status == "queued" and progress.get("status") == "running":
+                status = "running"
+            report = job["report"] or {}
+            return {
+                "id": job_id,
+                "status": status,
+                "nodes": report.get("nodes", progress.get("nodes", 0)),
+                "max_total_win_rate": report.get(
+                    "max_total_win_rate", progress.get("max_total_win_rate")
+                ),
+                "optimal": report.get("optimal", progress.get("optimal", False)),
+                "result": job["result"],
+                "error": job["error"],
+            }
+
+    def purge(self):
+        """
+        Remove the jobs that finished more than `retention` seconds ago.
+        """
+        now = time.time()
+        with self.lock:
+            for job_id in [
+                job_id
+                for job_id, job in self.jobs.items()
+                if job["finished"] is not None
+                and now - job["finished"] > self.retention
+            ]:
+                del self.jobs[job_id]
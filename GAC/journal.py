@@ -0,0 +1,170 @@
+"""
+Checkpoint journal of a scraped season
+
+The counters of each leader are appended to the journal while the pages
+of the leader are scraped, one JSON line for each counter, so the scraper
+doesn't keep them in memory. When all the pages are scraped, a line marks
+the leader as done. If the scraping stops, eg. after a network error, the
+next run reads the journal and only scrapes the leaders that are not done.
+
+A leader starts with a line that drops its counters from an earlier try,
+so a retried leader starts over from the first page, and only the
+counters of a done leader are read. If the same leader is done twice, the
+last one is used, so retries don't change the result. A line that was cut
+off by a crash is removed when the journal is read.
+"""
+
+from printinglog import Logger
+import json
+import os
+
+logger = Logger(format="simple")
+
+
+def journal_path(season: int) -> str:
+    """
+    Get the path of the journal of a season
+
+    Parameters:
+    ----------
+    season: int
+        The season number
+
+    Returns:
+    -------
+    path: str
+        Path of the journal, in the data folder
+    """
+    return os.path.join(os.getcwd(), "GAC/data/journal", f"Season_{season}.jsonl")
+
+
+class Journal:
+    """
+    Append-only journal with the counters of each scraped leader
+
+    Attributes:
+    ----------
+    path: str
+        Path of the journal file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+
+    def entries(self):
+        """
+        Read the lines of the journal, one at a time
+
+        Yields:
+        -------
+        entry: dict
+            The "leader" of the line, with "start", a "counter" or "done"
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r+b") as f:
+            end = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Remove a last line that was cut off, so the next line
+                    # isn't appended to it
+                    logger.warning(f"Removing an incomplete line from {self.path}")
+                    f.truncate(end)
+                    break
+                end += len(line)
+                if line.strip():
+                    yield json.loads(line)
+
+    def done(self) -> set[str]:
+        """
+        Get the leaders that are already scraped
+
+        Returns:
+        -------
+        leaders: set[str]
+            The leaders that are done in the journal
+        """
+        return {entry["leader"] for entry in self.entries() if "done" in entry}
+
+    def load(self) -> dict:
+        """
+        Read the counters of the leaders that are already scraped
+
+        Returns:
+        -------
+        counters: dict
+            The counters of each leader that is done in the journal
+        """
+        counters: dict = {}
+        pending: dict[str, list] = {}
+        for entry in self.entries():
+            leader = entry["leader"]
+            if "start" in entry:
+                pending[leader] = []
+            elif "counter" in entry:
+                pending.setdefault(leader, []).append(entry["counter"])
+            elif "done" in entry:
+                counters[leader] = pending.pop(leader, [])
+        return counters
+
+    def write_line(self, entry: dict):
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write(json.dumps(entry) + "\n")
+
+    def start(self, leader: str):
+        """
+        Start the counters of a leader, the counters of an earlier try
+        are dropped
+
+        Parameters:
+        ----------
+        leader: str
+            Leader of the team
+        """
+        self.write_line({"leader": leader, "start": True})
+
+    def append(self, leader: str, counter: dict):
+        """
+        Write a counter of a leader
+
+        Parameters:
+        ----------
+        leader: str
+            Leader of the team
+
+        counter: dict
+            A counter of the leader
+        """
+        self.write_line({"leader": leader, "counter": counter})
+
+    def finish(self, leader: str):
+        """
+        Mark the leader as done, the counters are on disk when this returns
+
+        Parameters:
+        ----------
+        leader: str
+            Leader of the team
+        """
+        self.write_line({"leader": leader, "done": True})
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        """
+        Close the journal file
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def remove(self):
+        """
+        Remove the journal, when the season is written to its data file
+        """
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
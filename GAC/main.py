@@ -1,10 +1,25 @@
-from .endpoints import get_all_characters, get_player_data
+from .endpoints import (
+    get_all_characters,
+    get_all_characters_async,
+    get_player_data,
+    get_player_data_async,
+)
+from .cache import TTLCache, round_fingerprint
+from .counters import CounterData, defense_signature, get_counters
 from .csp import calculate
-from .utils import read_data
 from printinglog import Logger
+from collections.abc import Callable
+import asyncio
 
 logger = Logger(format="simple")
 
+# Solutions of the GAC rounds that were solved to the end
+SOLUTION_CACHE = TTLCache(maxsize=256, ttl=30 * 60)
+
+# Maximum number of counters of similar defense teams, for the defense
+# teams with too few counters for the exact same team
+SIMILAR_LIMIT = 50
+
 
 def get_all_player_units(ally_code: str, min_gear_level=12) -> list:
     """
@@ -26,6 +41,33 @@ def get_all_player_units(ally_code: str, min_gear_level=12) -> list:
     # Get all player characters
     player_data = get_player_data(ally_code=ally_code)
 
+    return player_units(player_data, get_all_characters(), min_gear_level)
+
+
+async def get_all_player_units_async(ally_code: str, min_gear_level=12) -> list:
+    """
+    Same as get_all_player_units, but the player data and the characters
+    are fetched at the same time, without blocking the event loop
+
+    :param ally_code: The ally code of the player
+    :param min_gear_level: The minimum gear level of the characters
+    :return: List with all player characters with greater or equal to min_gear_level
+    """
+    player_data, characters = await asyncio.gather(
+        get_player_data_async(ally_code=ally_code), get_all_characters_async()
+    )
+    return player_units(player_data, characters, min_gear_level)
+
+
+def player_units(player_data: dict, characters: list, min_gear_level=12) -> list:
+    """
+    Get the player characters with greater or equal to min_gear_level
+
+    :param player_data: The player data from swgoh.gg
+    :param characters: All existing characters in the game
+    :param min_gear_level: The minimum gear level of the characters
+    :return: List with all player characters with greater or equal to min_gear_level
+    """
     # Get all existing characters in the game
     all_characters = {
         character["base_id"]: {
@@ -34,7 +76,7 @@ def get_all_player_units(ally_code: str, min_gear_level=12) -> list:
             "categories": character["categories"],
             "image": character["image"],
         }
-        for character in get_all_characters()
+        for character in characters
     }
 
     player_characters: list[dict] = []
@@ -62,38 +104,106 @@ def gl_in_team(team: list) -> bool:
     return False
 
 
+def roster_by_id(player_characters: list) -> dict[str, dict]:
+    """
+    Index the player characters by their base_id.
+
+    :param player_characters: List with the player characters
+    :return: Dictionary with each character by its base_id
+    """
+    return {character["base_id"]: character for character in player_characters}
+
+
 def counters_available(
-    counter: dict, player_characters: list, dest_list: list, has_gl: bool = False
+    counter: dict,
+    player_characters: list | dict,
+    dest_list: list,
+    has_gl: bool = False,
 ) -> list[dict]:
     """
     Check if the counter is available for the player.
 
     :param counter: Dictionary with the counter data
-    :param player_units: List with all available player units
+    :param player_characters: The available player units, preferably already
+        indexed by base_id with roster_by_id
     :param dest_list: List to append the counter to, if available
+    :param has_gl: If the defense team has a Galactic Legend
     :return: List with the appended counters
     """
+    if not isinstance(player_characters, dict):
+        player_characters = roster_by_id(player_characters)
+
+    # Don't add the counter if player doesn't have the required units,
+    # the loaded counter data has the set of the attack team already
+    attack_set = counter.get("attack_set") or frozenset(counter["attack"])
+    if not player_characters.keys() >= attack_set:
+        return dest_list
+
+    dest_list.append(
+        {
+            "attack": [player_characters[base_id] for base_id in counter["attack"]],
+            "win_rate": counter["win_rate"],
+            "has_gl": has_gl,
+        }
+    )
+    return dest_list
+
+
+def available_characters(data: dict, player_characters: list) -> list[dict]:
+    """
+    Remove the characters used on defense or in an attack from the player characters.
 
-    # Don't add the counter if player doesn't have the required units
-    attack: list[dict] = []
-    # Iterate through each character id in the counter
-    for counter_unit_base_id in counter["attack"]:
-        # Check if the player has the required unit
-        for character in player_characters:
-            if counter_unit_base_id == character["base_id"]:
-                attack.append(character)
+    :param data: Dictionary with the opponent, player and used_attack data
+    :param player_characters: List with all player characters
+    :return: List with the characters that are available to attack with
+    """
+    player_data = data["player"]
+    used_attack = data["used_attack"]
+    """
 
-    # If the counter is available, then add it to the list
-    if len(attack) == len(counter["attack"]):
-        dest_list.append(
+    'used_attack': [
+        [
+            
             {
-                "attack": attack,
-                "win_rate": counter["win_rate"],
-                "has_gl": has_gl,
+                "name": name,
+                "base_id": base_id,
+                "categories": categories
+                "image": image
             }
-        )
+        ]
+    ]
 
-    return dest_list
+    """
+
+    # Transform player defense to list of character IDs
+    player_defense_characters_with_id = [
+        character["base_id"]
+        for zone in player_data
+        for team in player_data[zone]
+        for character in team["defense"]
+    ]
+
+    # Add the used attack to the player defense characters
+    if used_attack != []:
+        for team_list in used_attack:
+            for character in team_list:
+                player_defense_characters_with_id.append(character["base_id"])
+
+    # Remove the defense characters from players available characters
+    # Each character in the list contains:
+    #
+    #     {
+    #         "name": character["name"],
+    #         "base_id": character["base_id"],
+    #         "categories": character["categories"],
+    #         "image": character["image"],
+    #     }
+    #
+    return [
+        character
+        for character in player_characters
+        if character["base_id"] not in player_defense_characters_with_id
+    ]
 
 
 def transform_data(
@@ -102,6 +212,7 @@ def transform_data(
     player_characters: list,
     focus: list[str],
     match_threshold: int = 5,
+    similar_limit: int | None = None,
 ) -> dict:
     """
     Transform the data to use character IDs and add all the available counters for each opponent team.
@@ -111,6 +222,9 @@ def transform_data(
     :param player_characters: List with all available player characters
     :param focus: List with the zones to focus on
     :param match_threshold: The threshold for how similar the defense team should be to the counter team
+    :param similar_limit: If there are not more counters than match_threshold, use this many
+        counters of the most similar defense teams, instead of all counters for the leader.
+        Only for the loaded counter data, by default all counters for the leader
     :return: List with the transformed data
 
     data = {
@@ -159,53 +273,17 @@ def transform_data(
 
     # Divide the data into opponent and player data
     oppone_data = data["opponent"]
-    player_data = data["player"]
-    used_attack = data["used_attack"]
-    """
-
-    'used_attack': [
-        [
-            
-            {
-                "name": name,
-                "base_id": base_id,
-                "categories": categories
-                "image": image
-            }
-        ]
-    ]
-
-    """
-
-    # Transform player defense to list of character IDs
-    player_defense_characters_with_id = [
-        character["base_id"]
-        for zone in player_data
-        for team in player_data[zone]
-        for character in team["defense"]
-    ]
-
-    # Add the used attack to the player defense characters
-    if used_attack != []:
-        for team_list in used_attack:
-            for character in team_list:
-                player_defense_characters_with_id.append(character["base_id"])
-
-    # Remove the defense characters from players available characters
-    # Each character in the list contains:
-    #
-    #     {
-    #         "name": character["name"],
-    #         "base_id": character["base_id"],
-    #         "categories": character["categories"],
-    #         "image": character["image"],
-    #     }
-    #
-    available_player_characters = [
-        character
-        for character in player_characters
-        if character["base_id"] not in player_defense_characters_with_id
-    ]
+    available_player_characters = available_characters(data, player_characters)
+    # The roster by base_id, and as a bitmask of the units in the counter
+    # data, so each counter is a subset check instead of a search
+    roster = roster_by_id(available_player_characters)
+    roster_mask = None
+    if isinstance(counters_data, CounterData):
+        roster_mask = counters_data.roster_mask(roster)
+
+    # The same defense team can be in more than one zone, so the
+    # counters are only searched once for each leader and members
+    counters_for_defense: dict[tuple[str, frozenset[str]], list] = {}
 
     transformed_data = {}
     for zone in oppone_data:
@@ -219,6 +297,16 @@ def transform_data(
 
             if team["defense"] == [] or team["eliminated"]:
                 continue
+            base_id_characters = [character["base_id"] for character in team["defense"]]
+            signature = defense_signature(base_id_characters)
+            if signature in counters_for_defense:
+                transformed_zone.append(
+                    {
+                        "defense": team["defense"],
+                        "counters": counters_for_defense[signature],
+                    }
+                )
+                continue
             # Find if team contains Galactic Legend
             has_gl = gl_in_team(team["defense"])
             # Leader is always the first character in the team
@@ -228,44 +316,62 @@ def transform_data(
             counters_for_leader = counters_data[leader_character]
             # List to store all counters available for the player
             counters: list = []
-            # FIND: All counters for the exact same defense team
-            base_id_characters = [character["base_id"] for character in team["defense"]]
-            for counter in counters_for_leader:
-                # Check if the team in def is exact same as counter-def for the team
-                if sorted(base_id_characters) == sorted(counter["defense"]):
-                    # Add only the counters that are available for the player
-                    counters = counters_available(
-                        counter=counter,
-                        player_characters=available_player_characters,
-                        dest_list=counters,
-                        has_gl=has_gl,
-                    )
-
-                    # Each character in counters will look like this:
-                    # {
-                    #     "attack": [
-                    #         {
-                    #             "name": name,
-                    #             "base_id": base_id,
-                    #             "categories": categories
-                    #             "image": image
-                    #         }
-                    #     ],
-                    #     "win_rate": 100,
-                    #     "has_gl": True
-                    # }
+            # FIND: All counters for the exact same defense team,
+            # the loaded counter data has them indexed by the signature
+            if isinstance(counters_data, CounterData):
+                exact_counters = counters_data.exact(signature)
+            else:
+                exact_counters = [
+                    counter
+                    for counter in counters_for_leader
+                    # Check if the team in def is exact same as counter-def for the team
+                    if sorted(base_id_characters) == sorted(counter["defense"])
+                ]
+            for counter in available_for_roster(
+                counters_data, exact_counters, roster_mask
+            ):
+                # Add only the counters that are available for the player
+                counters = counters_available(
+                    counter=counter,
+                    player_characters=roster,
+                    dest_list=counters,
+                    has_gl=has_gl,
+                )
+
+                # Each character in counters will look like this:
+                # {
+                #     "attack": [
+                #         {
+                #             "name": name,
+                #             "base_id": base_id,
+                #             "categories": categories
+                #             "image": image
+                #         }
+                #     ],
+                #     "win_rate": 100,
+                #     "has_gl": True
+                # }
 
             # If length of counters is too small, then add all available counters
             # for the leader, even if the defense team is not the exact same
             if len(counters) <= match_threshold:
                 # Reinitiallize counters, and add them again with no need of exact match.
                 counters = []
+                if similar_limit is not None and roster_mask is not None:
+                    # The counters of the most similar defense teams first
+                    candidates = counters_data.similar(
+                        signature, similar_limit, roster_mask
+                    )
+                else:
+                    candidates = available_for_roster(
+                        counters_data, counters_for_leader, roster_mask
+                    )
                 # Iterate through each counter for the leader
-                for counter in counters_for_leader:
+                for counter in candidates:
                     # Add only the counters that are available for the player
                     counters = counters_available(
                         counter=counter,
-                        player_characters=available_player_characters,
+                        player_characters=roster,
                         dest_list=counters,
                         has_gl=has_gl,
                     )
@@ -273,6 +379,7 @@ def transform_data(
             # If counters is empty, then add a default counter
             # it's either because of couldn't find data on that
             # exact def setup or player doesn't have the required units
+            counters_for_defense[signature] = counters
             transformed_zone.append({"defense": team["defense"], "counters": counters})
 
         transformed_data[zone] = transformed_zone
@@ -280,6 +387,22 @@ def transform_data(
     return transformed_data
 
 
+def available_for_roster(counters_data, counters, roster_mask: int | None):
+    """
+    Filter all the counters of a defense team at once with the roster bitmask.
+
+    :param counters_data: The counter data the counters are from
+    :param counters: The counters of the defense team
+    :param roster_mask: The bitmask of the roster, None if the counter
+        data is a plain dictionary without the bitmasks
+    :return: The counters the player has the units for, or all of them
+        if there is no bitmask and counters_available has to check them
+    """
+    if roster_mask is None:
+        return counters
+    return counters_data.available(counters, roster_mask)
+
+
 def transform_solution(data: dict, solution: list) -> dict:
     """
     Transform the solution to use character IDs
@@ -366,37 +489,32 @@ def transform_solution(data: dict, solution: list) -> dict:
     return data
 
 
-def main(
-    ally_code: str,
-    mode: str,
+def solve_round(
     gac_round: dict,
-    min_gear_level: int,
+    mode: str,
+    player_characters: list,
     focus_zone: list[str],
     debug: bool = False,
-):
-
-    # Get the opponent data
-    data: dict = gac_round["opponent"]
-
-    # Print the data for validation
-    if debug:
-        print("\n")
-        logger.debug("VALIDATION OF OPPONENTS DEFENSE:")
-        data = gac_round["opponent"]
-        for zone in data:
-            print(f"======= ZONE : {zone} =======")
-            for team in data[zone]:
-                defense = [character["base_id"] for character in team["defense"]]
-                print(f"Defense: {defense}")
-
-    # Get all ally_code players characters that
-    # have gear level greater than min_gear_level
-    player_characters = get_all_player_units(
-        ally_code=ally_code, min_gear_level=min_gear_level
-    )
+    solver_options: dict | None = None,
+    report: dict | None = None,
+    on_solution: Callable[[list], None] | None = None,
+) -> list:
+    """
+    Find the available counters for each defense team and solve the round.
+
+    :param gac_round: Dictionary with the opponent, player and used_attack data
+    :param mode: The GAC mode, 3v3 or 5v5
+    :param player_characters: List with all player characters
+    :param focus_zone: List with the zones to focus on
+    :param debug: Print the data for validation
+    :param solver_options: Options for the solver, eg. time_limit
+    :param report: Optional dictionary that is filled with the search stats
+    :param on_solution: Optional function that is called with each improved solution
+    :return: List with the solution
+    """
 
-    # Read the counter data from file | 3v3.json or 5v5.json
-    counters = read_data(mode)
+    # The counter data of 3v3.json or 5v5.json, loaded once
+    counters = get_counters(mode)
 
     # Transform the GAC round data to use character ID
     # and add all the available counters for each opponent team
@@ -406,6 +524,7 @@ def main(
         player_characters=player_characters,
         match_threshold=1,
         focus=focus_zone,
+        similar_limit=SIMILAR_LIMIT,
     )
 
     # Print the transformed data for validation
@@ -424,7 +543,179 @@ def main(
                     print(f"({counter['win_rate']}) Counter: {counter_list}")
 
     # Calculate the best teams to use against the opponent teams
-    solution = calculate(data=data_to_calculate)
+    return calculate(
+        data=data_to_calculate,
+        report=report,
+        on_solution=on_solution,
+        **(solver_options or {}),
+    )
+
+
+def round_key(
+    mode: str,
+    gac_round: dict,
+    min_gear_level: int,
+    focus_zone: list[str],
+    player_characters: list,
+    solver_options: dict | None = None,
+) -> str:
+    """
+    The key of the round in SOLUTION_CACHE, from the parts of the round
+    the solution depends on, see `round_fingerprint`
+
+    :param mode: The GAC mode, 3v3 or 5v5
+    :param gac_round: Dictionary with the opponent, player and used_attack data
+    :param min_gear_level: The minimum gear level of the characters
+    :param focus_zone: List with the zones to focus on
+    :param player_characters: The player characters
+    :param solver_options: Options for the solver, eg. exact
+    :return: The key of the round
+    """
+    solver_options = solver_options or {}
+    return round_fingerprint(
+        mode=mode,
+        min_gear_level=min_gear_level,
+        available_units=[
+            character["base_id"]
+            for character in available_characters(gac_round, player_characters)
+        ],
+        opponent=gac_round["opponent"],
+        focus_zone=focus_zone,
+        solver=solver_options.get("solver", "bitmask"),
+        data_version=get_counters(mode).mtime,
+        exact=solver_options.get("exact", True),
+        max_values=solver_options.get("max_values"),
+    )
+
+
+def cached_solution(fingerprint: str) -> tuple[list, dict] | None:
+    """
+    Get the solution of a round from SOLUTION_CACHE
+
+    :param fingerprint: The key of the round, see `round_key`
+    :return: The solution and the search stats, with "cached" True,
+        or None if the round is not in the cache
+    """
+    cached = SOLUTION_CACHE.get(fingerprint)
+    if cached is None:
+        return None
+    logger.info("Solution found in cache")
+    solution, stats = cached
+    return solution, {**stats, "cached": True}
+
+
+def cache_solution(fingerprint: str, solution: list, stats: dict):
+    """
+    Add the solution of a round to SOLUTION_CACHE, if it's proven the best
+
+    :param fingerprint: The key of the round, see `round_key`
+    :param solution: The solution of the solver
+    :param stats: The search stats of the solution
+    """
+    # Only cache the solutions that are proven the best, the others
+    # could be improved with more time
+    if stats.get("optimal"):
+        stats = {key: value for key, value in stats.items() if key != "cached"}
+        SOLUTION_CACHE.set(fingerprint, (solution, stats))
+
+
+def main(
+    ally_code: str,
+    mode: str,
+    gac_round: dict,
+    min_gear_level: int,
+    focus_zone: list[str],
+    debug: bool = False,
+    solver_options: dict | None = None,
+    report: dict | None = None,
+    use_cache: bool = True,
+    player_characters: list | None = None,
+    on_solution: Callable[[dict], None] | None = None,
+):
+    """
+    Calculate the best attack teams against the opponents defense.
+
+    :param ally_code: The ally code of the player
+    :param mode: The GAC mode, 3v3 or 5v5
+    :param gac_round: Dictionary with the opponent, player and used_attack data
+    :param min_gear_level: The minimum gear level of the characters
+    :param focus_zone: List with the zones to focus on
+    :param debug: Print the data for validation
+    :param solver_options: Options for the solver, eg. time_limit
+    :param report: Optional dictionary that is filled with the search stats,
+        eg. "optimal" is False if the solver ran out of time and "cached"
+        is True if the solution was found in the cache
+    :param use_cache: Use the solution of the same round, if it was solved
+        before, and cache the new solution. Off in the solver pool, where the
+        app process caches the solutions, see `GAC.executor`
+    :param player_characters: The player characters, if they are already fetched
+        eg. with get_all_player_units_async, otherwise they are fetched here
+    :param on_solution: Optional function that is called with the opponent data
+        and the best team for each defense team, each time the solver finds a
+        better solution
+    :return: The opponent data with the best team for each defense team
+    """
+
+    # Get the opponent data
+    data: dict = gac_round["opponent"]
+
+    # Print the data for validation
+    if debug:
+        print("\n")
+        logger.debug("VALIDATION OF OPPONENTS DEFENSE:")
+        data = gac_round["opponent"]
+        for zone in data:
+            print(f"======= ZONE : {zone} =======")
+            for team in data[zone]:
+                defense = [character["base_id"] for character in team["defense"]]
+                print(f"Defense: {defense}")
+
+    # Get all ally_code players characters that
+    # have gear level greater than min_gear_level
+    if player_characters is None:
+        player_characters = get_all_player_units(
+            ally_code=ally_code, min_gear_level=min_gear_level
+        )
+
+    solver_options = solver_options or {}
+    cached = None
+    if use_cache:
+        # The key of the round, only the parts the solution depends on
+        fingerprint = round_key(
+            mode=mode,
+            gac_round=gac_round,
+            min_gear_level=min_gear_level,
+            focus_zone=focus_zone,
+            player_characters=player_characters,
+            solver_options=solver_options,
+        )
+        cached = cached_solution(fingerprint)
+    if cached is not None:
+        solution, stats = cached
+    else:
+        stats = {}
+
+        def send_solution(solution: list):
+            # Copy the teams, as transform_solution adds the best team to them
+            opponent = {zone: [dict(team) for team in data[zone]] for zone in data}
+            on_solution(transform_solution(data=opponent, solution=solution))
+
+        solution = solve_round(
+            gac_round=gac_round,
+            mode=mode,
+            player_characters=player_characters,
+            focus_zone=focus_zone,
+            debug=debug,
+            solver_options=solver_options,
+            report=stats,
+            on_solution=send_solution if on_solution is not None else None,
+        )
+        if use_cache:
+            cache_solution(fingerprint, solution, stats)
+        stats = {**stats, "cached": False}
+
+    if report is not None:
+        report.update(stats)
 
     # Transform the solution to be added to the original opponent data
     transformed_solution = transform_solution(data=data, solution=solution)
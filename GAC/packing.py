@@ -0,0 +1,376 @@
+"""
+# Weighted set packing
+
+The GAC round can also be seen as a weighted set packing problem. Each
+defense team gets at most one counter, each unit is used at most once and
+the total win rate should be as high as possible.
+
+It is solved as an exact cover problem with Algorithm X, where:
+
+### Rows:
+    One row for each counter of each defense team, and one empty row for
+    each defense team that means the team gets no counter.
+
+### Columns:
+    One column for each defense team, that must be covered exactly once,
+    and one column for each unit, that can be covered at most once.
+
+Unlike `BitmaskCSP`, a team can be left without a counter even if there is
+a counter left for it, if that gives a higher total win rate.
+
+"""
+
+from .bounds import key_unit_matching
+import time
+
+
+class SetPackingSolver:
+    """
+    A weighted exact cover solver, with Algorithm X and branch and bound.
+
+    Attributes
+    ----------
+    variables : list[int]
+        A list of variable indices.
+    domains : list[tuple[int, dict]]
+        A list of tuples with the variable index and the domain values.
+    logging : bool
+        A optional boolean to enable logging.
+    solution : list
+        The best solution found.
+    max_total_win_rate : float
+        The maximum total win rate found.
+    X : dict[tuple[str, str | int], set[int]]
+        The rows of each column that is not covered.
+    Y : dict[int, list[tuple[str, str | int]]]
+        The columns of each row.
+    rows : list[tuple[int, int | None, int]]
+        The variable, counter index and score of each row.
+    nodes : int
+        The number of nodes explored.
+    keys : list
+        The key unit column of each row, the unit used by the most rows.
+    pruned : dict[str, int]
+        The number of nodes pruned by each bound.
+    optimal : bool
+        True if the search finished, so the solution is proven the best.
+
+    """
+
+    def __init__(
+        self,
+        variables: list[int],
+        domains: list[tuple[int, dict]],
+        logging: bool = False,
+        time_limit: float | None = None,
+        node_limit: int | None = None,
+    ):
+        """
+        Constructs all the necessary attributes for the SetPackingSolver object.
+
+        Parameters
+        ----------
+        variables : list[int]
+            A list of variable indices.
+        domains : list[tuple[int, dict]]
+            A list of tuples with the variable index and the domain values.
+        logging : bool, optional
+            A boolean to enable logging, by default False.
+        time_limit : float | None, optional
+            The maximum number of seconds to search, by default no limit.
+        node_limit : int | None, optional
+            The maximum number of nodes to explore, by default no limit.
+        """
+        self.variables = variables
+        self.domains = domains
+        self.logging = logging
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.solution = None
+        self.max_total_win_rate = -1
+        self.nodes = 0
+        self.pruned = {"sum": 0, "matching": 0}
+        self.optimal = False
+        self.deadline = None
+
+        # Same lookup as CSP.order_domain, first domain with the index
+        self.domain: dict[int, dict] = {}
+        for index, domain in domains:
+            self.domain.setdefault(index, domain)
+
+        self.X: dict[tuple, set[int]] = {}
+        self.Y: dict[int, list[tuple]] = {}
+        self.rows: list[tuple[int, int | None, int]] = []
+        for var in variables:
+            self.X[("team", var)] = set()
+            counters = sorted(
+                enumerate(self.domain[var]["counters"]),
+                key=lambda x: x[1]["win_rate"],
+                reverse=True,
+            )
+            for index, counter in counters:
+                # If defense team has a GL, then win rate
+                # threshold should be 80% or more...
+                if counter["has_gl"] and counter["win_rate"] < 80:
+                    continue
+                units = dict.fromkeys(unit["base_id"] for unit in counter["attack"])
+                # Same integer score as BitmaskCSP, to avoid float errors
+                self.add_row(
+                    var,
+                    index,
+                    round(counter["win_rate"] * 100),
+                    [("unit", unit) for unit in units],
+                )
+            # The team can always be left without a counter
+            self.add_row(var, None, 0, [])
+
+        self.open = {("team", var) for var in variables}
+
+        # The key unit of each row, for the matching bound in GAC.bounds
+        self.keys: list = []
+        for row in range(len(self.rows)):
+            units = self.Y[row][1:]
+            key = None
+            if units:
+                key = max(units, key=lambda unit: (len(self.X[unit]), unit))
+            self.keys.append(key)
+
+        self.best_score = -1
+        self.best_rows: tuple[int, ...] = ()
+
+    def add_row(self, var: int, index: int | None, score: int, units: list[tuple]):
+        """
+        Add a row that covers the team column and the unit columns.
+
+        Parameters
+        ----------
+        var : int
+            The variable index.
+        index : int | None
+            The counter index, or None if the team gets no counter.
+        score : int
+            The score of the counter.
+        units : list[tuple]
+            The unit columns of the counter.
+        """
+        row = len(self.rows)
+        self.rows.append((var, index, score))
+        self.Y[row] = [("team", var), *units]
+        for column in self.Y[row]:
+            self.X.setdefault(column, set()).add(row)
+
+    def solve(self):
+        """
+        Solves the set packing problem.
+        """
+        if self.time_limit is not None:
+            self.deadline = time.monotonic() + self.time_limit
+
+        # Start from the greedy solution, so the bound prunes from the start
+        self.save_solution(*self.greedy())
+        self.optimal = self.search(total=0, selected=[])
+
+        self.solution = self.build_solution(self.best_rows)
+        return self.solution
+
+    def greedy(self) -> tuple[int, list[int]]:
+        """
+        Select the best row of each team that doesn't use a used unit.
+
+        Returns
+        -------
+        tuple[int, list[int]]
+            The total score and the selected rows.
+        """
+        used: set = set()
+        total = 0
+        selected = []
+        for var in self.variables:
+            rows = sorted(self.X[("team", var)], key=self.row_order)
+            for row in rows:
+                units = self.Y[row][1:]
+                if used.isdisjoint(units):
+                    used.update(units)
+                    total += self.rows[row][2]
+                    selected.append(row)
+                    break
+        return total, selected
+
+    def search(self, total: int, selected: list[int]) -> bool:
+        """
+        Algorithm X, with the rows of the smallest column first.
+
+        Parameters
+        ----------
+        total : int
+            The total score of the selected rows.
+        selected : list[int]
+            The selected rows.
+
+        Returns
+        -------
+        bool
+            False if the search was stopped by the time or node limit.
+        """
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            return False
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            return False
+
+        # Every team is covered, check if it is the best solution
+        if not self.open:
+            self.save_solution(total, selected)
+            return True
+
+        if self.prune(total):
+            return True
+
+        # The team column with the fewest rows left
+        column = min(self.open, key=lambda column: (len(self.X[column]), column))
+        for row in sorted(self.X[column], key=self.row_order):
+            selected.append(row)
+            columns = self.select(row)
+            finished = self.search(total + self.rows[row][2], selected)
+            self.deselect(row, columns)
+            selected.pop()
+            if not finished:
+                return False
+        return True
+
+    def prune(self, total: int) -> bool:
+        """
+        Check if the open teams can't beat the best solution, first with
+        the best row of each team and then with the key unit matching.
+
+        Parameters
+        ----------
+        total : int
+            The total score of the selected rows.
+
+        Returns
+        -------
+        bool
+            True if the path should be pruned, otherwise False.
+        """
+        edges = {}
+        for column in self.open:
+            keys: dict = {}
+            for row in self.X[column]:
+                value_score = self.rows[row][2]
+                key = self.keys[row]
+                if key is not None and value_score > keys.get(key, 0):
+                    keys[key] = value_score
+            if keys:
+                edges[column] = keys
+
+        bound = sum(max(keys.values()) for keys in edges.values())
+        if total + bound <= self.best_score:
+            self.pruned["sum"] += 1
+            return True
+        if total + key_unit_matching(edges) <= self.best_score:
+            self.pruned["matching"] += 1
+            return True
+        return False
+
+    def row_order(self, row: int) -> tuple[int, int]:
+        """
+        Sort key for the rows, the highest score first.
+
+        Parameters
+        ----------
+        row : int
+            The row.
+
+        Returns
+        -------
+        tuple[int, int]
+            The negated score and the row.
+        """
+        return -self.rows[row][2], row
+
+    def select(self, row: int) -> list[set[int]]:
+        """
+        Cover the columns of the row, and remove the rows that share a column.
+
+        Parameters
+        ----------
+        row : int
+            The selected row.
+
+        Returns
+        -------
+        list[set[int]]
+            The removed columns, to restore with `deselect`.
+        """
+        columns = []
+        for j in self.Y[row]:
+            for i in self.X[j]:
+                for k in self.Y[i]:
+                    if k != j:
+                        self.X[k].remove(i)
+            columns.append(self.X.pop(j))
+        self.open.discard(self.Y[row][0])
+        return columns
+
+    def deselect(self, row: int, columns: list[set[int]]):
+        """
+        Restore the columns and rows removed by `select`.
+
+        Parameters
+        ----------
+        row : int
+            The selected row.
+        columns : list[set[int]]
+            The removed columns from `select`.
+        """
+        self.open.add(self.Y[row][0])
+        for j in reversed(self.Y[row]):
+            self.X[j] = columns.pop()
+            for i in self.X[j]:
+                for k in self.Y[i]:
+                    if k != j:
+                        self.X[k].add(i)
+
+    def save_solution(self, total: int, selected: list[int]):
+        """
+        Save the selected rows if it is the best solution found.
+
+        Parameters
+        ----------
+        total : int
+            The total score of the selected rows.
+        selected : list[int]
+            The selected rows.
+        """
+        if total > self.best_score:
+            self.best_score = total
+            self.max_total_win_rate = total / 100
+            self.best_rows = tuple(selected)
+
+    def build_solution(self, selected: tuple[int, ...]) -> list[tuple[int, dict]]:
+        """
+        Build the solution in the same format as `CSP.solve`.
+
+        Parameters
+        ----------
+        selected : tuple[int, ...]
+            The selected rows.
+
+        Returns
+        -------
+        list[tuple[int, dict]]
+            A list of tuples with the variable index and the domain,
+            with the assigned counter as "best_team".
+        """
+        chosen = {self.rows[row][0]: self.rows[row][1] for row in selected}
+        solution = []
+        for var in self.variables:
+            domain = self.domain[var]
+            index = chosen.get(var)
+            if index is None:
+                best_team = {"attack": [], "win_rate": 0}
+            else:
+                best_team = domain["counters"][index]
+            solution.append((var, {**domain, "best_team": best_team}))
+        return solution
@@ -0,0 +1,280 @@
+"""
+# Parallel search
+
+The search tree of `BitmaskCSP` is split at the first variables in the
+order into independent subproblems, that are solved in a process pool.
+The workers share the best score found through a `multiprocessing.Value`,
+so a worker can prune with the solutions found by the other workers.
+
+The answer is the same as the serial search. The serial search keeps the
+first solution in the search order with the highest total, so a worker
+only prunes paths that are lower than the shared best score, never the
+ones that are equal, and the results are merged in the search order.
+
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+
+from .csp import BitmaskCSP, SearchLimitReached
+
+# The solver of the worker process, and the arguments to create it
+_worker = None
+_worker_args: tuple = ()
+
+
+class SubproblemCSP(BitmaskCSP):
+    """
+    A BitmaskCSP that solves a subproblem, and shares the best score
+    with the other workers.
+
+    Attributes
+    ----------
+    shared : multiprocessing.Value
+        The best score found by any worker.
+    found : tuple[int, tuple] | None
+        The total score and the assignment of the best solution found
+        in the subproblem.
+    """
+
+    def __init__(self, *args, shared=None, **kwargs):
+        """
+        Constructs all the necessary attributes for the SubproblemCSP object.
+
+        Parameters
+        ----------
+        shared : multiprocessing.Value
+            The best score found by any worker.
+        """
+        super().__init__(*args, **kwargs)
+        self.shared = shared
+        self.found = None
+
+    def count_node(self):
+        """
+        Count an explored node, and read the shared best score.
+        """
+        super().count_node()
+        # The scores are integers, so pruning with the shared best score
+        # minus one only prunes the paths that are lower than it
+        if self.nodes % 64 == 0:
+            self.best_score = max(self.best_score, self.shared.value - 1)
+
+    def save_solution(self, total: int, assignment: list) -> bool:
+        """
+        Save the assignment if it is the best solution found, and
+        share the score with the other workers.
+
+        Parameters
+        ----------
+        total : int
+            The total score of the assignment.
+        assignment : list
+            A list of tuples with the variable and counter index.
+
+        Returns
+        -------
+        bool
+            True if the assignment is the new best solution.
+        """
+        if not super().save_solution(total, assignment):
+            return False
+        self.found = (total, self.best_assignment)
+        with self.shared.get_lock():
+            if total > self.shared.value:
+                self.shared.value = total
+        return True
+
+    def solve_subproblem(self, prefix: list[tuple[int, int | None]]) -> bool:
+        """
+        Assign the prefix and search the rest of the variables.
+
+        Parameters
+        ----------
+        prefix : list[tuple[int, int | None]]
+            The variable and the position in `values` of the first
+            variables in the order, the position is None if the variable
+            has no value.
+
+        Returns
+        -------
+        bool
+            True if the search finished within the limits.
+        """
+        self.nodes = 0
+        self.pruned = dict.fromkeys(self.pruned, 0)
+        self.found = None
+        self.best_score = self.shared.value - 1
+
+        total = 0
+        used = 0
+        assignment = []
+        trails = []
+        removed = 0
+        for depth, (var, position) in enumerate(prefix):
+            # Same as backtrack_forward, the variable is no longer left
+            if self.forward_checking:
+                best = self.best_live_score(var, self.live[var])
+                self.remaining_best -= best
+                removed += best
+            if position is None:
+                assignment.append((var, None))
+                continue
+            mask, value_score, index = self.values[var][position]
+            if self.forward_checking:
+                trails.append(self.forward_check(depth, self.value_units[var][position]))
+            used |= mask
+            total += value_score
+            assignment.append((var, index))
+
+        depth = len(prefix)
+        if self.forward_checking:
+            search = self.backtrack_forward(depth, total, assignment)
+        else:
+            search = self.backtrack(depth, used, total, assignment)
+        for _ in search:
+            pass
+
+        for trail in reversed(trails):
+            self.undo(trail)
+        self.remaining_best += removed
+        return True
+
+
+def split(csp: BitmaskCSP, split_depth: int) -> list[list[tuple[int, int | None]]]:
+    """
+    Split the search into subproblems, in the same order as the search.
+
+    Parameters
+    ----------
+    csp : BitmaskCSP
+        The solver to split.
+    split_depth : int
+        The number of variables to assign in each subproblem.
+
+    Returns
+    -------
+    list[list[tuple[int, int | None]]]
+        The variable and the position in `values` of the first variables
+        in the order, for each subproblem.
+    """
+    prefixes: list[tuple[list, int]] = [([], 0)]
+    for var in csp.order[:split_depth]:
+        children = []
+        for prefix, used in prefixes:
+            assigned = False
+            for position, (mask, _, _) in enumerate(csp.values[var]):
+                if not mask & used:
+                    assigned = True
+                    children.append((prefix + [(var, position)], used | mask))
+            # If no value can be assigned, add the variable without a value
+            if not assigned:
+                children.append((prefix + [(var, None)], used))
+        prefixes = children
+    return [prefix for prefix, _ in prefixes]
+
+
+def init_worker(variables, domains, options, shared, deadline):
+    """
+    Store the arguments to create the solver of the worker process.
+    """
+    global _worker, _worker_args
+    _worker = None
+    _worker_args = (variables, domains, options, shared, deadline)
+
+
+def solve_subproblem(prefix: list[tuple[int, int | None]]) -> tuple:
+    """
+    Solve a subproblem in the worker process.
+
+    Parameters
+    ----------
+    prefix : list[tuple[int, int | None]]
+        The first variables of the subproblem, see `split`.
+
+    Returns
+    -------
+    tuple
+        The best solution found or None, the number of nodes explored,
+        the number of nodes pruned by each bound and if the search finished.
+    """
+    global _worker
+    if _worker is None:
+        variables, domains, options, shared, deadline = _worker_args
+        _worker = SubproblemCSP(variables, domains, shared=shared, **options)
+        _worker.deadline = deadline
+
+    try:
+        optimal = _worker.solve_subproblem(prefix)
+    except SearchLimitReached:
+        optimal = False
+    worker = _worker
+    if not optimal:
+        # The search stopped in the middle, so the domains are not
+        # restored, create a new solver for the next subproblem
+        _worker = None
+    return worker.found, worker.nodes, worker.pruned, optimal
+
+
+def search_parallel(csp: BitmaskCSP):
+    """
+    Solve the subproblems in a process pool, and yield each improved
+    solution. The solver should already have the greedy solution.
+
+    Parameters
+    ----------
+    csp : BitmaskCSP
+        The solver, with `workers` and `split_depth`.
+
+    Yields
+    ------
+    list[tuple[int, dict]]
+        The best solution found so far.
+    """
+    prefixes = split(csp, csp.split_depth)
+    shared = multiprocessing.Value("q", csp.best_score)
+    options = {
+        "forward_checking": csp.forward_checking,
+        "bounds": tuple(bound.name for bound in csp.bounds),
+        "node_limit": csp.node_limit,
+        "exact": csp.exact,
+        "max_values": csp.max_values,
+    }
+
+    results: list = [None] * len(prefixes)
+    optimal = True
+    with ProcessPoolExecutor(
+        max_workers=csp.workers,
+        initializer=init_worker,
+        initargs=(csp.variables, csp.domains, options, shared, csp.deadline),
+    ) as executor:
+        futures = {
+            executor.submit(solve_subproblem, prefix): i
+            for i, prefix in enumerate(prefixes)
+        }
+        for future in as_completed(futures):
+            found, nodes, pruned, finished = future.result()
+            results[futures[future]] = found
+            optimal = optimal and finished
+            csp.nodes += nodes
+            for name, count in pruned.items():
+                csp.pruned[name] += count
+            if found is not None and csp.save_solution(found[0], found[1]):
+                yield csp.build_solution(csp.best_assignment)
+
+    # The same solution as the serial search, the first one in the
+    # search order with the highest total
+    best = max(
+        (found for found in results if found is not None),
+        key=lambda found: found[0],
+        default=None,
+    )
+    if best is not None and best[0] >= csp.best_score:
+        if best[1] != csp.best_assignment:
+            csp.best_score = best[0]
+            csp.max_total_win_rate = best[0] / 100
+            csp.best_assignment = best[1]
+            yield csp.build_solution(csp.best_assignment)
+
+    if not optimal:
+        raise SearchLimitReached()
@@ -0,0 +1,850 @@
+"""
+Concurrent scraper for the GAC counter pages
+
+The counter pages of the leaders are fetched by a number of workers at the
+same time, over pooled connections. All requests go through one token
+bucket, so the site never gets more than RATE requests per second, however
+many workers there are. The workers wait for the site instead of sleeping
+before each request, so the time is spent on the requests that are allowed.
+
+With a `PageCache`, a page that was scraped before is requested with its
+ETag and Last-Modified, and only parsed again if it changed. The leaders
+without any counters are checked less often, see `Scraper.skip_empty`.
+
+The pages are parsed with `parse_page`, which reads the counter cards and
+the pagination links as the HTML is read, without building a tree of the
+whole page. `parse_counters` and `next_page_url` do the same with a soup,
+see benchmark.py for a comparison of the two.
+"""
+
+from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+from journal import Journal
+from printinglog import Logger
+from urllib.parse import urljoin
+from typing import AsyncIterator
+import asyncio
+import hashlib
+import httpx
+import json
+import os
+import re
+import time
+
+logger = Logger(format="simple")
+
+# The site with the counter pages, eg. a local fixture server for testing
+SITE_URL = os.environ.get("SWGOH_SITE_URL", "https://swgoh.gg/")
+
+# Maximum requests per second, and the requests that can be sent at once
+# after a pause, the default is the same rate as the old sleep(1)
+RATE = float(os.environ.get("SWGOH_SCRAPE_RATE", 1))
+BURST = int(os.environ.get("SWGOH_SCRAPE_BURST", 1))
+
+# Number of leaders scraped at the same time
+CONCURRENCY = int(os.environ.get("SWGOH_SCRAPE_CONCURRENCY", 8))
+
+# Seconds to wait for a page, and retries of a failed request
+TIMEOUT = 30
+RETRIES = 3
+BACKOFF = 2.0
+
+# Maximum number of runs an empty leader is skipped, before it's checked again
+EMPTY_SKIP_MAX = 8
+
+
+def counter_from_card(leader: str, links: list[str], lines: list[str]) -> dict:
+    """
+    Get the counter of a counter card
+
+    Parameters:
+    ----------
+    leader: str
+        Leader of the team
+
+    links: list[str]
+        The href of each <a> tag in the card, in order
+
+    lines: list[str]
+        The stripped text of each "flex-1" div in the card, in order
+
+    Returns:
+    -------
+    counter: dict
+        The attack, defense, win_rate, avg_banners and seen of the counter
+    """
+    # Variables for each counter card
+    a_team: list[str] = []  # Attack team
+    d_team: list[str] = [leader]  # Defense team
+    win_rate = 0
+    avg_banners = 0.0
+    seen = 0
+
+    # Iterate through all the urls with the character names
+    for character in links:
+        # URL could look like this:
+        # ..CHAMPIONSHIPS_GRAND_ARENA_GA2_EVENT_SEASON_55&d_member=SEVENTHSISTER
+        # Hence we split the url by "&" and then by "=" to get the character name
+        member, name = character.split("&")[1].split("=")
+
+        # Position is either a (attack) or d (defense)
+        # and either lead or member.
+        if member[0] == "a":
+            a_team.append(name)
+        elif member[0] == "d":
+            d_team.append(name)
+
+    # Iterate through each line of the win rate and win history data
+    for line in lines:
+        # If the line starts with "Win" it is the win rate
+        if line.startswith("Win"):
+            # Remove all non-digits from the line, eg. %99% -> 99
+            win_rate = int(re.sub(r"\D", "", line))
+        # If the line starts with "Avg" it is the average banners
+        elif line.startswith("Avg"):
+            # Remove the "Avg" from the line, eg. Avg 50 -> 50
+            avg_banners = float(line.strip("Avg"))
+        # If the line starts with "Seen" it is the value of times counter been seen
+        elif line.startswith("Seen"):
+            seen_raw = line.strip("Seen")
+            # First line will be the complete string, add last time
+            if not "Win" in seen_raw:
+                # eg. 1,327 -> 1327
+                seen_raw = seen_raw.replace(",", "")
+                # eg. 11.3K -> 11300
+                seen_raw = seen_raw.replace(".", "")
+                seen_raw = seen_raw.replace("K", "00")
+                # Save the value as an integer
+                seen = int(seen_raw)
+
+    return {
+        "attack": a_team,
+        "defense": d_team,
+        "win_rate": win_rate,
+        "avg_banners": avg_banners,
+        "seen": seen,
+    }
+
+
+def parse_counters(soup: BeautifulSoup, leader: str) -> list[dict]:
+    """
+    Get the counters from the counter cards of a page
+
+    Parameters:
+    ----------
+    soup: BeautifulSoup
+        Soup object of the page
+
+    leader: str
+        Leader of the team
+
+    Returns:
+    -------
+    counters: list[dict]
+        List of counters on the page
+    """
+    # Iterate through all the counter cards
+    # Each counter card has a list of characters
+    # It starts with the counter and ends with the defense
+    return [
+        counter_from_card(
+            leader,
+            # Each <a> tag has a url with the character name
+            [character.get("href") for character in counter.find_all("a")],
+            # The win rate and win history data of the counter
+            [d.get_text(strip=True) for d in counter.find_all("div", {"class": "flex-1"})],
+        )
+        for counter in soup.find_all("div", {"class": "paper paper--size-sm"})
+    ]
+
+
+def next_page_url(soup: BeautifulSoup, site_url: str = SITE_URL) -> str | None:
+    """
+    Get the URL of the next page of counters
+
+    Parameters:
+    ----------
+    soup: BeautifulSoup
+        Soup object of the page
+
+    site_url: str
+        URL of the site, the link is relative to it
+
+    Returns:
+    -------
+    url: str | None
+        URL of the next page, or None if it's the last page
+    """
+    pagination = soup.find_all("a", {"class": "pagination__link"})
+    if pagination and pagination[-1].get_text(strip=True) == "Next":
+        return urljoin(site_url, pagination[-1].get("href"))
+    return None
+
+
+class CounterPageParser(HTMLParser):
+    """
+    Streaming parser of a counter page
+
+    Reads the <a> links and the "flex-1" lines of each counter card, and
+    the pagination links, while the HTML is fed to it. A counter is added
+    when the end of its card is read, the rest of the page is skipped.
+    The result is the same as `parse_counters` and `next_page_url`.
+
+    The cards are nested the same way as in the soup, if a card isn't
+    closed, the next card is inside it, and its links and lines are also
+    in the outer card. The cards that are still open at the end of the
+    page are added when the parser is closed. Both are logged, as the
+    counters of the outer card are wrong.
+
+    Attributes:
+    ----------
+    leader: str
+        Leader of the team
+
+    counters: list[dict]
+        The counters of the cards that are read, in the order the cards
+        start
+
+    pagination: tuple[str, list[str]] | None
+        The href and the text of the last pagination link
+    """
+
+    def __init__(self, leader: str):
+        super().__init__()
+        self.leader = leader
+        self.counters: list[dict] = []
+        self.pagination: tuple[str, list[str]] | None = None
+        self.depth = 0  # Open <div> tags
+        # Depth, position in counters, links and lines of the open cards
+        self.cards: list[tuple[int, int, list[str], list[list[str]]]] = []
+        self.open_lines: list[tuple[int, list[str]]] = []
+        self.in_pagination = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "div":
+            self.depth += 1
+            classes = (dict(attrs).get("class") or "").split()
+            if classes == ["paper", "paper--size-sm"]:
+                if self.cards:
+                    logger.warning(
+                        f"A counter card of {self.leader} is inside another card"
+                    )
+                # Keep the place of the card, a nested card ends before it
+                self.cards.append((self.depth, len(self.counters), [], []))
+                self.counters.append(None)
+            elif self.cards and "flex-1" in classes:
+                # The text of a line is also in the lines it's nested in
+                text: list[str] = []
+                for _, _, _, lines in self.cards:
+                    lines.append(text)
+                self.open_lines.append((self.depth, text))
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            for _, _, links, _ in self.cards:
+                links.append(href)
+            if "pagination__link" in (dict(attrs).get("class") or "").split():
+                self.pagination = (href, [])
+                self.in_pagination = True
+
+    def handle_endtag(self, tag):
+        if tag == "div":
+            # An end tag without an open <div> is ignored, as in the soup
+            if self.depth == 0:
+                return
+            if self.open_lines and self.open_lines[-1][0] == self.depth:
+                self.open_lines.pop()
+            if self.cards and self.cards[-1][0] == self.depth:
+                self.add_counter(self.cards.pop())
+            self.depth -= 1
+        elif tag == "a":
+            self.in_pagination = False
+
+    def handle_data(self, data):
+        if self.open_lines or self.in_pagination:
+            data = data.strip()
+            if not data:
+                return
+            for _, text in self.open_lines:
+                text.append(data)
+            if self.in_pagination:
+                self.pagination[1].append(data)
+
+    def add_counter(self, card: tuple[int, int, list[str], list[list[str]]]):
+        _, position, links, lines = card
+        self.counters[position] = counter_from_card(
+            self.leader, links, ["".join(text) for text in lines]
+        )
+
+    def close(self):
+        super().close()
+        if self.cards:
+            logger.warning(
+                f"{len(self.cards)} counter cards of {self.leader} are not closed"
+            )
+            while self.cards:
+                self.add_counter(self.cards.pop())
+
+
+def parse_page(
+    content: str | bytes, leader: str, site_url: str = SITE_URL
+) -> tuple[list[dict], str | None]:
+    """
+    Get the counters of a page and the URL of the next page, with a
+    `CounterPageParser`
+
+    Parameters:
+    ----------
+    content: str | bytes
+        HTML of the page, bytes are decoded as UTF-8
+
+    leader: str
+        Leader of the team
+
+    site_url: str
+        URL of the site, the next page link is relative to it
+
+    Returns:
+    -------
+    counters: list[dict]
+        List of counters on the page
+
+    next_url: str | None
+        URL of the next page, or None if it's the last page
+    """
+    if isinstance(content, bytes):
+        content = content.decode("utf-8", errors="replace")
+    parser = CounterPageParser(leader)
+    parser.feed(content)
+    parser.close()
+
+    next_url = None
+    if parser.pagination is not None and "".join(parser.pagination[1]) == "Next":
+        next_url = urljoin(site_url, parser.pagination[0])
+    return parser.counters, next_url
+
+
+class TokenBucket:
+    """
+    Rate limiter shared by all the workers
+
+    Attributes:
+    ----------
+    rate: float
+        Number of tokens added each second
+
+    burst: int
+        Maximum number of tokens
+
+    tokens: float
+        Number of tokens left
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """
+        Wait until there is a token, and take it
+
+        The waiting workers get the tokens in the order they asked for them
+        """
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class PageCache:
+    """
+    Metadata of the scraped counter pages, saved between the runs
+
+    Each page has the ETag and Last-Modified of the response, for the
+    conditional requests, and a hash of the content, so an unchanged page
+    isn't parsed again, and a hash of the parsed counters, so a page where
+    only the markup changed, eg. a token, keeps its counters. The parsed
+    counters of each page are in a file of their own, in a folder next to
+    the JSON file, and they are only read when the page didn't change. The
+    URLs of the pages include the season, but the runs each leader was
+    empty are kept by the leader, so the back-off of `Scraper.skip_empty`
+    continues in the next season.
+
+    Attributes:
+    ----------
+    path: str
+        Path of the JSON file
+
+    directory: str
+        Folder with the counters of each page
+
+    pages: dict[str, dict]
+        The metadata of each page, by the URL
+
+    leaders: dict[str, dict]
+        The runs each leader was "empty" in a row, and the runs it was
+        "skipped" since it was last checked
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.directory = os.path.splitext(path)[0]
+        self.pages: dict[str, dict] = {}
+        self.leaders: dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                data = json.load(f)
+            self.pages = data.get("pages", {})
+            self.leaders = data.get("leaders", {})
+
+    def counters_path(self, url: str) -> str:
+        name = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def get(self, url: str) -> dict | None:
+        """
+        Get the metadata of a page, or None if the page or its counters
+        are not in the cache
+        """
+        page = self.pages.get(url)
+        if page is None or not os.path.exists(self.counters_path(url)):
+            return None
+        return page
+
+    def get_counters(self, url: str) -> list[dict]:
+        """
+        Read the counters of a page in the cache
+        """
+        with open(self.counters_path(url), "r") as f:
+            return json.load(f)
+
+    def put(self, url: str, page: dict, counters: list[dict] | None = None):
+        """
+        Set the metadata of a page, and write its counters if they are
+        parsed again, None keeps the counters in the cache
+        """
+        if counters is not None:
+            path = self.counters_path(url)
+            os.makedirs(self.directory, exist_ok=True)
+            with open(f"{path}.tmp", "w") as f:
+                json.dump(counters, f)
+            os.replace(f"{path}.tmp", path)
+        self.pages[url] = page
+
+    def get_leader(self, leader: str) -> dict:
+        """
+        Get the back-off of a leader, a new leader was never empty
+        """
+        return self.leaders.setdefault(leader, {"empty": 0, "skipped": 0})
+
+    def save(self, teams: set[str] | None = None):
+        """
+        Write the metadata to the file
+
+        Parameters:
+        ----------
+        teams: set[str] | None
+            Only keep the pages of these teams, by the URL of their first
+            page, eg. not the pages of the seasons that are not scraped
+            anymore. By default, or if no teams were scraped, all pages
+            are kept. The back-off of the leaders is always kept
+        """
+        pages = self.pages
+        if teams:
+            pages = {url: page for url, page in pages.items() if page["team"] in teams}
+            # Remove the counters of the other pages
+            kept = {os.path.basename(self.counters_path(url)) for url in pages}
+            if os.path.isdir(self.directory):
+                for name in os.listdir(self.directory):
+                    if name not in kept:
+                        os.remove(os.path.join(self.directory, name))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump({"pages": pages, "leaders": self.leaders}, f)
+        os.replace(temporary_path, self.path)
+
+
+class Scraper:
+    """
+    Scrape the counter pages with a number of workers
+
+    Attributes:
+    ----------
+    concurrency: int
+        Number of leaders scraped at the same time
+
+    site_url: str
+        URL of the site with the counter pages
+
+    bucket: TokenBucket
+        Rate limiter of all the requests
+
+    cache: PageCache | None
+        Metadata of the pages from the last runs, to send conditional
+        requests and skip the leaders that are always empty
+
+    requests: int
+        Number of requests sent, including the retries
+
+    unchanged: int
+        Number of pages that didn't change since the last run
+
+    skipped: int
+        Number of empty leaders that were not checked in this run
+    """
+
+    def __init__(
+        self,
+        concurrency: int = CONCURRENCY,
+        rate: float = RATE,
+        burst: int = BURST,
+        site_url: str = SITE_URL,
+        cache: PageCache | None = None,
+    ):
+        self.concurrency = concurrency
+        self.site_url = site_url
+        self.bucket = TokenBucket(rate=rate, burst=burst)
+        self.cache = cache
+        self.requests = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=concurrency, max_keepalive_connections=concurrency
+            ),
+            follow_redirects=True,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.client.aclose()
+
+    async def fetch(self, url: str, headers: dict | None = None) -> httpx.Response:
+        """
+        Get the url response
+
+        A request that fails with a connection error, 429 or a server error
+        is sent again after a backoff, or after the Retry-After of the site
+
+        Parameters:
+        ----------
+        url: str
+            URL to the page
+
+        headers: dict | None
+            Headers of the request, eg. for a conditional request
+
+        Returns:
+        -------
+        response: httpx.Response
+            The response, 304 if the page didn't change
+        """
+        for attempt in range(RETRIES + 1):
+            await self.bucket.acquire()
+            self.requests += 1
+            delay = BACKOFF * 2**attempt
+            try:
+                response = await self.client.get(url, headers=headers)
+            except httpx.TransportError as e:
+                if attempt == RETRIES:
+                    raise
+                logger.warning(f"Retrying {url}: {e}")
+            else:
+                retry = response.status_code == 429 or response.status_code >= 500
+                if not retry or attempt == RETRIES:
+                    # 304 is not an error, the page didn't change
+                    if response.status_code >= 400:
+                        try:
+                            response.raise_for_status()
+                        except httpx.HTTPStatusError as e:
+                            logger.error(f"Error: {e}")
+                            raise
+                    return response
+                logger.warning(f"Retrying {url}: {response.status_code}")
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+            await asyncio.sleep(delay)
+
+    async def get_counters_page(self, leader: str, url: str, team: str) -> dict:
+        """
+        Get the counters of a page, and the URL of the next page
+
+        With the cache, the request is conditional, and the page is only
+        parsed if it changed since the last run
+
+        Parameters:
+        ----------
+        leader: str
+            Leader of the team
+
+        url: str
+            URL to the page
+
+        team: str
+            URL to the first page of the team
+
+        Returns:
+        -------
+        page: dict
+            The "counters" and the "next" URL of the page, with the
+            metadata of the cache
+        """
+        page = self.cache.get(url) if self.cache is not None else None
+        headers = {}
+        if page is not None:
+            if page.get("etag"):
+                headers["If-None-Match"] = page["etag"]
+            if page.get("last_modified"):
+                headers["If-Modified-Since"] = page["last_modified"]
+
+        response = await self.fetch(url, headers=headers)
+        if page is not None and response.status_code == 304:
+            self.unchanged += 1
+            return {**page, "counters": self.cache.get_counters(url)}
+
+        changed = True
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        if page is not None and page["hash"] == content_hash:
+            # The site doesn't support conditional requests, but the
+            # content is the same, so it's not parsed again
+            self.unchanged += 1
+            changed = False
+            counters = self.cache.get_counters(url)
+        else:
+            # Parse in a thread, so the other workers can send requests
+            counters, next_url = await asyncio.to_thread(
+                parse_page, response.text, leader, self.site_url
+            )
+            counters_hash = hashlib.sha256(json.dumps(counters).encode()).hexdigest()
+            if page is not None and page.get("counters_hash") == counters_hash:
+                # Only the markup changed, eg. a token in the page, the
+                # counters in the cache are kept
+                self.unchanged += 1
+                changed = False
+            page = {
+                **(page or {}),
+                "hash": content_hash,
+                "counters_hash": counters_hash,
+                "next": next_url,
+            }
+        page = {
+            **page,
+            "team": team,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        if self.cache is not None:
+            self.cache.put(url, page, counters if changed else None)
+        return {**page, "counters": counters}
+
+    def skip_empty(self, leader: str, url: str) -> bool:
+        """
+        Check if an empty leader can be skipped in this run
+
+        A leader that had no counters in the last runs is checked less and
+        less often, after being empty n times in a row it's skipped for
+        min(2 ** (n - 1), EMPTY_SKIP_MAX) runs. The runs are counted in
+        any season, but the first scrape of a team in a season is never
+        skipped, as the season file keeps its counters for good
+
+        Parameters:
+        ----------
+        leader: str
+            Leader of the team
+
+        url: str
+            URL to the first page of the team in this season
+
+        Returns:
+        -------
+        skip: bool
+            True if the leader is skipped, its counters are still empty
+        """
+        if self.cache is None or self.cache.get(url) is None:
+            return False
+        backoff = self.cache.get_leader(leader)
+        if not backoff["empty"]:
+            return False
+        if backoff["skipped"] >= min(2 ** (backoff["empty"] - 1), EMPTY_SKIP_MAX):
+            return False
+        backoff["skipped"] += 1
+        self.skipped += 1
+        return True
+
+    async def iter_counters(self, leader: str, url: str) -> AsyncIterator[dict]:
+        """
+        Walk the pages of the team(leader), and yield the counters of each
+        page before the next page is requested
+
+        An empty leader can be skipped, see `skip_empty`, and the runs it
+        was empty in a row are counted when all the pages are read
+
+        Parameters:
+        ----------
+        leader: str
+            Leader of the team
+
+        url: str
+            URL to the first page with the counters
+
+        Yields:
+        -------
+        counter: dict
+            Each counter for the team(leader), in the order of the pages
+        """
+        if self.skip_empty(leader, url):
+            return
+
+        empty = True
+        visited: set[str] = set()
+        next_url: str | None = url
+        while next_url is not None:
+            # A page that links back to an earlier page would never end
+            if next_url in visited:
+                logger.warning(f"Pagination of {leader} returns to {next_url}")
+                break
+            visited.add(next_url)
+
+            page = await self.get_counters_page(leader, next_url, team=url)
+            for counter in page["counters"]:
+                empty = False
+                yield counter
+            next_url = page["next"]
+
+        # Count the runs the leader was empty in a row
+        if self.cache is not None:
+            backoff = self.cache.get_leader(leader)
+            backoff["empty"] = backoff["empty"] + 1 if empty else 0
+            backoff["skipped"] = 0
+
+    async def scrape(
+        self, links: dict[str, str], progress=None, journal: Journal | None = None
+    ) -> dict:
+        """
+        Get all the counters for each team(leader), with `concurrency` workers
+
+        Parameters:
+        ----------
+        links: dict[str, str]
+            URL to the first counter page of each leader
+
+        progress: Callable[[str], None] | None
+            Called with the leader when its counters are scraped
+
+        journal: Journal | None
+            Journal of the season, the leaders done in it are not scraped
+            again. Each counter is appended to it when it's scraped, instead
+            of being kept in memory, and the counters are read from it when
+            all the leaders are done
+
+        Returns:
+        -------
+        counters: dict
+            The counters of each leader, in the same order as links
+        """
+        counters: dict = {}
+        done: set[str] = set()
+        if journal is not None:
+            done = journal.done() & links.keys()
+            if done:
+                logger.info(
+                    f"Resuming, {len(done)} of {len(links)} teams already scraped"
+                )
+                if progress is not None:
+                    for leader in links:
+                        if leader in done:
+                            progress(leader)
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for leader, url in links.items():
+            if leader not in done:
+                queue.put_nowait((leader, url))
+
+        async def worker():
+            while not queue.empty():
+                leader, url = queue.get_nowait()
+                if journal is not None:
+                    # A failed leader is not done, it starts over on the next run
+                    journal.start(leader)
+                    async for counter in self.iter_counters(leader, url):
+                        journal.append(leader, counter)
+                    journal.finish(leader)
+                else:
+                    counters[leader] = [
+                        counter async for counter in self.iter_counters(leader, url)
+                    ]
+                if progress is not None:
+                    progress(leader)
+
+        workers = [
+            asyncio.create_task(worker())
+            for _ in range(max(1, min(self.concurrency, queue.qsize())))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            # Stop the other workers if one of them failed
+            for task in workers:
+                task.cancel()
+            if journal is not None:
+                journal.close()
+
+        if journal is not None:
+            counters = journal.load()
+        return {leader: counters[leader] for leader in links}
+
+
+def scrape_counters(
+    links: dict[str, str],
+    progress=None,
+    journal: Journal | None = None,
+    **options,
+) -> dict:
+    """
+    Get all the counters for each team(leader), see `Scraper.scrape`
+
+    Parameters:
+    ----------
+    links: dict[str, str]
+        URL to the first counter page of each leader
+
+    progress: Callable[[str], None] | None
+        Called with the leader when its counters are scraped
+
+    journal: Journal | None
+        Journal to resume from and to append each scraped counter to
+
+    options:
+        The options of the Scraper, eg. concurrency and rate
+
+    Returns:
+    -------
+    counters: dict
+        The counters of each leader, in the same order as links
+    """
+
+    async def scrape():
+        async with Scraper(**options) as scraper:
+            counters = await scraper.scrape(links, progress=progress, journal=journal)
+            logger.info(
+                f"Scraped {len(links)} teams with {scraper.requests} requests,"
+                f" {scraper.unchanged} pages unchanged,"
+                f" {scraper.skipped} empty teams skipped"
+            )
+            return counters
+
+    return asyncio.run(scrape())
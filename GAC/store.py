@@ -0,0 +1,245 @@
+"""
+# Counter store
+
+A compact binary copy of the counter data of a mode, written by
+`create_data` next to the JSON file. The unit ids are interned, the numbers
+of the counters are fixed width columns, and the counters of each leader
+are a range of rows. The file is memory mapped when it's loaded, so the
+workers of the web app share the page cache of one copy, and a leader is
+only decoded when its counters are used.
+
+The layout is little-endian, each section is aligned to 8 bytes:
+
+    header          magic, version and the number of units, leaders,
+                    counters, defense members and attack members
+    unit_offsets    uint32 * (units + 1), the range of each unit in names
+    leaders         uint32 * leaders, the unit id of each leader
+    leader_offsets  uint32 * (leaders + 1), the counters of each leader
+    win_rate        float64 * counters
+    avg_banners     float64 * counters
+    seen            uint32 * counters
+    defense_offsets uint32 * (counters + 1), the members of each defense
+    attack_offsets  uint32 * (counters + 1), the members of each attack
+    defense         uint32 * defense members, unit ids
+    attack          uint32 * attack members, unit ids
+    names           the utf-8 base_id of the units
+
+"""
+
+from array import array
+from collections.abc import Mapping
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b"GACC"
+VERSION = 1
+HEADER = struct.Struct("<4s6I")
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _column(typecode: str, values) -> bytes:
+    column = array(typecode, values)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column.tobytes()
+
+
+def write_counter_store(data: dict, path: str) -> None:
+    """
+    Write the counters of a mode to a store file.
+
+    The file is written to a temporary file first and then renamed, so the
+    processes that have the old file mapped keep a complete copy.
+
+    Parameters
+    ----------
+    data : dict
+        The counters of each leader, same as the JSON file, with the
+        defense, attack, win_rate, avg_banners and seen of each counter.
+    path : str
+        The path of the store file.
+    """
+    units: dict[str, int] = {}
+
+    def intern(base_id: str) -> int:
+        return units.setdefault(base_id, len(units))
+
+    leaders: list[int] = []
+    leader_offsets = [0]
+    win_rate: list[float] = []
+    avg_banners: list[float] = []
+    seen: list[int] = []
+    defense_offsets = [0]
+    attack_offsets = [0]
+    defense: list[int] = []
+    attack: list[int] = []
+    for leader, counters in data.items():
+        leaders.append(intern(leader))
+        for counter in counters:
+            win_rate.append(counter["win_rate"])
+            avg_banners.append(counter.get("avg_banners", 0))
+            seen.append(counter.get("seen", 0))
+            defense.extend(intern(base_id) for base_id in counter["defense"])
+            attack.extend(intern(base_id) for base_id in counter["attack"])
+            defense_offsets.append(len(defense))
+            attack_offsets.append(len(attack))
+        leader_offsets.append(len(win_rate))
+
+    names = [base_id.encode("utf-8") for base_id in units]
+    unit_offsets = [0]
+    for name in names:
+        unit_offsets.append(unit_offsets[-1] + len(name))
+
+    sections = [
+        _column("I", unit_offsets),
+        _column("I", leaders),
+        _column("I", leader_offsets),
+        _column("d", win_rate),
+        _column("d", avg_banners),
+        _column("I", seen),
+        _column("I", defense_offsets),
+        _column("I", attack_offsets),
+        _column("I", defense),
+        _column("I", attack),
+        b"".join(names),
+    ]
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        len(units),
+        len(leaders),
+        len(win_rate),
+        len(defense),
+        len(attack),
+    )
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(header)
+        for section in sections:
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            f.write(section)
+    os.replace(temporary_path, path)
+
+
+class CounterStore(Mapping):
+    """
+    The counters of a mode from a memory mapped store file, by leader.
+
+    The counters of a leader are decoded on each lookup, to the same
+    dictionaries as in the JSON file.
+
+    Attributes
+    ----------
+    path : str
+        The path of the store file.
+    units : tuple[str, ...]
+        The base_id of each unit, by its id in the file.
+
+    """
+
+    def __init__(self, path: str):
+        """
+        Map the store file and read the unit ids.
+
+        Parameters
+        ----------
+        path : str
+            The path of the store file.
+
+        Raises
+        ------
+        ValueError
+            If the file is not a counter store of this version.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n_units, n_leaders, n_counters, n_defense, n_attack = (
+            HEADER.unpack_from(self.buffer)
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} counter store")
+
+        offset = HEADER.size
+        columns = []
+        for typecode, length in (
+            ("I", n_units + 1),
+            ("I", n_leaders),
+            ("I", n_leaders + 1),
+            ("d", n_counters),
+            ("d", n_counters),
+            ("I", n_counters),
+            ("I", n_counters + 1),
+            ("I", n_counters + 1),
+            ("I", n_defense),
+            ("I", n_attack),
+        ):
+            offset = _align(offset)
+            size = length * struct.calcsize(typecode)
+            columns.append(self._column(typecode, offset, size))
+            offset += size
+        (
+            unit_offsets,
+            leaders,
+            self.leader_offsets,
+            self.win_rate,
+            self.avg_banners,
+            self.seen,
+            self.defense_offsets,
+            self.attack_offsets,
+            self.defense,
+            self.attack,
+        ) = columns
+
+        offset = _align(offset)
+        names = self.buffer[offset : offset + unit_offsets[n_units]]
+        self.units: tuple[str, ...] = tuple(
+            names[unit_offsets[i] : unit_offsets[i + 1]].decode("utf-8")
+            for i in range(n_units)
+        )
+        self.leaders: dict[str, int] = {
+            self.units[unit]: index for index, unit in enumerate(leaders)
+        }
+
+    def _column(self, typecode: str, offset: int, size: int):
+        view = memoryview(self.buffer)[offset : offset + size]
+        if sys.byteorder == "little":
+            return view.cast(typecode)
+        # The file is little-endian, a big-endian machine gets a copy
+        column = array(typecode, view)
+        column.byteswap()
+        return column
+
+    def __getitem__(self, leader: str) -> list[dict]:
+        index = self.leaders[leader]
+        units = self.units
+        counters = []
+        for row in range(self.leader_offsets[index], self.leader_offsets[index + 1]):
+            defense = self.defense[self.defense_offsets[row] : self.defense_offsets[row + 1]]
+            attack = self.attack[self.attack_offsets[row] : self.attack_offsets[row + 1]]
+            counters.append(
+                {
+                    "defense": [units[unit] for unit in defense],
+                    "attack": [units[unit] for unit in attack],
+                    "win_rate": self.win_rate[row],
+                    "avg_banners": self.avg_banners[row],
+                    "seen": self.seen[row],
+                }
+            )
+        return counters
+
+    def __contains__(self, leader) -> bool:
+        return leader in self.leaders
+
+    def __iter__(self):
+        return iter(self.leaders)
+
+    def __len__(self) -> int:
+        return len(self.leaders)
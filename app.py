@@ -1,11 +1,61 @@
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import os
+
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
-from GAC import calculate_attack_teams
+from GAC import get_all_player_units_async
+from GAC.counters import reload_counters
+from GAC.endpoints import close_client
+from GAC.executor import (
+    SolverBusy,
+    SolverPool,
+    lookup_attack_teams,
+    solve_attack_teams,
+    store_attack_teams,
+)
+from GAC.jobs import JobStore
+
+# Maximum seconds the solver searches, before returning the best found
+SOLVER_TIME_LIMIT = 10
+
+# Jobs don't hold a connection open, so they can search for longer
+JOB_TIME_LIMIT = int(os.environ.get("JOB_TIME_LIMIT", 60))
+# Seconds a finished job is kept, for the client to get the result
+JOB_RETENTION = int(os.environ.get("JOB_RETENTION", 15 * 60))
+
+# Number of solver processes, and number of requests that can wait for one,
+# the requests after that get 503 until there is room again
+SOLVER_WORKERS = int(os.environ.get("SOLVER_WORKERS", os.cpu_count() or 1))
+SOLVER_QUEUE_SIZE = int(os.environ.get("SOLVER_QUEUE_SIZE", 16))
+
+# Maximum seconds a request waits for the solver, including the queue
+REQUEST_TIMEOUT = float(os.environ.get("REQUEST_TIMEOUT", SOLVER_TIME_LIMIT + 20))
+
+solver_pool = SolverPool(workers=SOLVER_WORKERS, queue_size=SOLVER_QUEUE_SIZE)
+jobs = JobStore(pool=solver_pool, retention=JOB_RETENTION)
+
 
-app = FastAPI()
+# Token for the admin endpoints, they are disabled if it's not set
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the counters before the solver processes start, so they
+    # don't parse the counter files on their first request
+    reload_counters()
+    yield
+    # Close the pooled swgoh.gg connections and the solver processes on shutdown
+    await close_client()
+    solver_pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Mount static files (CSS, JS, Images)
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -19,11 +69,13 @@ async def get_form(request: Request):
     return templates.TemplateResponse("form.html", {"request": request})
 
 
-@app.post("/calculate")
-async def calculate(request: Request):
+async def read_round(data: dict) -> dict:
+    """
+    Read the GAC round from the request data, and fetch the player units.
 
-    # Get the JSON data from the request
-    data = await request.json()
+    :param data: The JSON data of the request
+    :return: The arguments for GAC.main.main, without the solver options
+    """
 
     # Extract data from the request
     ally_code = data.get("allyCode")  # str
@@ -43,15 +95,179 @@ async def calculate(request: Request):
     # At the moment dummy data
     focus_zone = ["T1", "B1", "B2"]
 
-    # Calculate the attack recommendations
-    attack_recommendations = calculate_attack_teams(
-        ally_code=ally_code,
-        mode=mode,
-        gac_round=gac_round,
-        min_gear_level=int(min_gear),
-        focus_zone=focus_zone,
-        debug=False,
+    # Fetch the player units without blocking the other requests
+    player_characters = await get_all_player_units_async(
+        ally_code=ally_code, min_gear_level=min_gear
+    )
+
+    return {
+        "ally_code": ally_code,
+        "mode": mode,
+        "gac_round": gac_round,
+        "min_gear_level": int(min_gear),
+        "focus_zone": focus_zone,
+        "debug": False,
+        "player_characters": player_characters,
+    }
+
+
+@app.post("/calculate")
+async def calculate(request: Request):
+
+    # Get the JSON data from the request
+    data = await request.json()
+    round_data = await read_round(data)
+
+    # Return a job id right away, the client polls /jobs/{id} for the result.
+    # The round is looked up in the cache in a thread, same as below
+    if data.get("async"):
+        try:
+            job_id = await asyncio.to_thread(
+                jobs.submit, solver_options={"time_limit": JOB_TIME_LIMIT}, **round_data
+            )
+        except SolverBusy:
+            return solver_busy()
+        return JSONResponse(status_code=202, content={"jobId": job_id})
+
+    # The same round solved before, the workers don't share their caches
+    solver_options = {"time_limit": SOLVER_TIME_LIMIT}
+    fingerprint, cached = await asyncio.to_thread(
+        lookup_attack_teams, solver_options=solver_options, **round_data
+    )
+
+    # Calculate the attack recommendations in the solver pool,
+    # so the other requests are not blocked while it searches
+    if cached is not None:
+        attack_recommendations, report = cached
+    else:
+        try:
+            result = await solver_pool.run(
+                solve_attack_teams,
+                timeout=REQUEST_TIMEOUT,
+                solver_options=solver_options,
+                **round_data,
+            )
+        except SolverBusy:
+            return solver_busy()
+        except asyncio.TimeoutError:
+            return JSONResponse(
+                status_code=504,
+                content={"error": "The solver didn't finish in time"},
+            )
+        store_attack_teams(fingerprint, result)
+        attack_recommendations, report = result
+
+    # Return the recommendations as JSON, optimal is False
+    # if the solver ran out of time before proving it's the best
+    return JSONResponse(
+        content={
+            "attackRecommendations": attack_recommendations,
+            "optimal": report["optimal"],
+        }
+    )
+
+
+@app.post("/calculate/stream")
+async def calculate_stream(request: Request):
+
+    # Get the JSON data from the request
+    data = await request.json()
+    round_data = await read_round(data)
+
+    # The same round solved before, the workers don't share their caches
+    solver_options = {"time_limit": SOLVER_TIME_LIMIT}
+    fingerprint, cached = await asyncio.to_thread(
+        lookup_attack_teams, solver_options=solver_options, **round_data
+    )
+
+    # Start the solver before the response, so a full pool is still a 503
+    if cached is not None:
+        events = cached_events(cached)
+    else:
+        try:
+            events = solver_pool.stream(
+                solve_attack_teams,
+                timeout=REQUEST_TIMEOUT,
+                solver_options=solver_options,
+                **round_data,
+            )
+        except SolverBusy:
+            return solver_busy()
+
+    # Send each better solution as a server-sent event, the first one is
+    # the greedy solution, and the last event has the final result
+    async def event_stream():
+        try:
+            async for kind, value in events:
+                if kind == "solution":
+                    yield server_sent_event("solution", {"attackRecommendations": value})
+                else:
+                    store_attack_teams(fingerprint, value)
+                    attack_recommendations, report = value
+                    yield server_sent_event(
+                        "done",
+                        {
+                            "attackRecommendations": attack_recommendations,
+                            "optimal": report["optimal"],
+                        },
+                    )
+        except asyncio.TimeoutError:
+            yield server_sent_event("error", {"error": "The solver didn't finish in time"})
+        except Exception as error:
+            yield server_sent_event("error", {"error": str(error)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/admin/reload-counters")
+async def admin_reload_counters(request: Request):
+
+    if ADMIN_TOKEN is None or request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return JSONResponse(status_code=403, content={"error": "Forbidden"})
+
+    # The solver processes reload by themselves when the files change
+    loaded = await asyncio.to_thread(reload_counters)
+    return JSONResponse(content={"reloaded": loaded})
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown job"})
+
+    # The status is queued, running, done, failed or cancelled, and the
+    # best total so far is updated while the solver is running
+    return JSONResponse(
+        content={
+            "jobId": job["id"],
+            "status": job["status"],
+            "nodes": job["nodes"],
+            "maxTotalWinRate": job["max_total_win_rate"],
+            "optimal": job["optimal"],
+            "attackRecommendations": job["result"],
+            "error": job["error"],
+        }
     )
 
-    # Return the recommendations as JSON
-    return JSONResponse(content={"attackRecommendations": attack_recommendations})
+
+def server_sent_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def cached_events(result: tuple[dict, dict]):
+    # Same events as SolverPool.stream, for a solution from the cache
+    yield "done", result
+
+
+def solver_busy() -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"error": "The solver is busy, try again soon"},
+        headers={"Retry-After": "5"},
+    )
@@ -118,23 +118,50 @@ export function submitForm(event) {
   const calculateButton = document.querySelector('input[value="Calculate"]');
   calculateButton.disabled = true;
 
-  // Send data to the server
-  fetch("/calculate", {
+  // Send data to the server, the recommendations are streamed
+  // and updated each time the solver finds a better solution
+  fetch("/calculate/stream", {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
     },
     body: JSON.stringify(data),
   })
-    .then((response) => response.json())
-    .then((result) => {
+    .then(async (response) => {
+      if (!response.ok) {
+        const result = await response.json();
+        throw new Error(result.error);
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+          break;
+        }
+        // Events are separated by an empty line, keep the last
+        // part in the buffer as it can be an unfinished event
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+
+        events.forEach((text) => {
+          const event = parseServerSentEvent(text);
+          if (event.type === "error") {
+            throw new Error(event.data.error);
+          }
+          // Display the attack recommendations under each opponent's defense team
+          displayAttackRecommendations(event.data.attackRecommendations);
+          loadingIndicator.textContent = "Improving...";
+        });
+      }
+
       // Remove loading indicator
       mainContent.removeChild(loadingIndicator);
       // Enable the Calculate button
       calculateButton.disabled = false;
-
-      // Display the attack recommendations under each opponent's defense team
-      displayAttackRecommendations(result.attackRecommendations);
     })
     .catch((error) => {
       console.error("Error calculating attack teams:", error);
@@ -145,3 +172,17 @@ export function submitForm(event) {
       alert("An error occurred while calculating attack teams.");
     });
 }
+
+// Parse a server-sent event, with its type and JSON data
+function parseServerSentEvent(text) {
+  const event = { type: "message", data: "" };
+  text.split("\n").forEach((line) => {
+    if (line.startsWith("event:")) {
+      event.type = line.slice(6).trim();
+    } else if (line.startsWith("data:")) {
+      event.data += line.slice(5).trim();
+    }
+  });
+  event.data = JSON.parse(event.data);
+  return event;
+}
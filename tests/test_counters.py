@@ -0,0 +1,314 @@
+"""
+The counter data of a mode, loaded from the JSON file or the binary store
+in a temporary data folder.
+"""
+
+import json
+import os
+import random
+
+import pytest
+
+from GAC import counters, main
+from GAC.store import CounterStore, write_counter_store
+
+
+def make_counters(seed: int, leaders: int = 6, per_leader: int = 20) -> dict:
+    """
+    Random counters of a few leaders, with the same fields as the JSON file
+    that `create_data` writes.
+    """
+    r = random.Random(seed)
+    units = [f"U{i}" for i in range(30)]
+    data = {}
+    for i in range(leaders):
+        leader = f"L{i}"
+        data[leader] = [
+            {
+                "defense": [leader] + r.sample(units, r.randint(0, 4)),
+                "attack": r.sample(units, r.randint(1, 5)),
+                "win_rate": float(r.randint(10, 100)),
+                "avg_banners": round(r.uniform(10, 60), 1),
+                "seen": r.randint(1, 2000),
+            }
+            for _ in range(per_leader)
+        ]
+    return data
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """
+    An empty GAC/data folder in the working directory, and no loaded
+    counters, that are checked for changes on each call.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(counters, "CHECK_INTERVAL", 0)
+    monkeypatch.setattr(counters, "_loaded", {})
+    monkeypatch.setattr(counters, "_checked", {})
+    path = tmp_path / "GAC" / "data"
+    path.mkdir(parents=True)
+    return path
+
+
+def write_json(path, data: dict, mtime: float):
+    with open(path, "w") as f:
+        json.dump(data, f)
+    os.utime(path, (mtime, mtime))
+
+
+def write_store(path, data: dict, mtime: float):
+    write_counter_store(data, str(path))
+    os.utime(path, (mtime, mtime))
+
+
+def test_store_older_than_json_is_not_used(data_dir):
+    old, new = make_counters(0), make_counters(1)
+    write_json(data_dir / "3v3.json", old, 1000)
+    write_store(data_dir / "3v3.bin", old, 1001)
+    assert counters.counters_path("3v3").endswith(".bin")
+    assert counters.get_counters("3v3")["L0"][0]["attack"] == tuple(old["L0"][0]["attack"])
+
+    # The JSON file is written again without the store
+    write_json(data_dir / "3v3.json", new, 2000)
+    assert counters.counters_path("3v3").endswith(".json")
+    assert counters.get_counters("3v3")["L0"][0]["attack"] == tuple(new["L0"][0]["attack"])
+
+    # A store without the JSON file is used
+    os.remove(data_dir / "3v3.json")
+    assert counters.counters_path("3v3").endswith(".bin")
+
+
+def test_loaded_once(data_dir):
+    write_json(data_dir / "3v3.json", make_counters(0), 1000)
+    loaded = counters.get_counters("3v3")
+    assert counters.get_counters("3v3") is loaded
+    # The data is read only, it's shared by the requests
+    with pytest.raises(TypeError):
+        loaded["L0"][0]["win_rate"] = 0
+
+
+def test_reloaded_when_file_changes(data_dir, monkeypatch):
+    old, new = make_counters(0), make_counters(1)
+    write_json(data_dir / "3v3.json", old, 1000)
+    loaded = counters.get_counters("3v3")
+    assert loaded.mtime == 1000
+
+    # The file isn't checked again until CHECK_INTERVAL has passed
+    monkeypatch.setattr(counters, "CHECK_INTERVAL", 60)
+    write_json(data_dir / "3v3.json", new, 2000)
+    assert counters.get_counters("3v3") is loaded
+
+    monkeypatch.setattr(counters, "CHECK_INTERVAL", 0)
+    reloaded = counters.get_counters("3v3")
+    assert reloaded.mtime == 2000
+    assert reloaded["L0"][0]["attack"] == tuple(new["L0"][0]["attack"])
+
+
+def test_reload_counters(data_dir):
+    old, new = make_counters(0), make_counters(1)
+    write_json(data_dir / "3v3.json", old, 1000)
+    loaded = counters.get_counters("3v3")
+
+    # The same modification time, so only a reload sees the new data
+    write_json(data_dir / "3v3.json", new, 1000)
+    assert counters.get_counters("3v3") is loaded
+    assert counters.reload_counters() == {"3v3": 1000}
+    assert counters.get_counters("3v3")["L0"][0]["attack"] == tuple(new["L0"][0]["attack"])
+
+
+def fields(counter) -> tuple:
+    """
+    The fields of a counter from the file, to compare the loaded counters.
+    """
+    return (
+        tuple(counter["defense"]),
+        tuple(counter["attack"]),
+        counter["win_rate"],
+        counter["avg_banners"],
+        counter["seen"],
+    )
+
+
+def random_defenses(data: dict, seed: int) -> list[list[str]]:
+    """
+    The stored defense teams with the members shuffled, and random ones.
+    """
+    r = random.Random(seed)
+    defenses = []
+    for leader, found in data.items():
+        for counter in r.sample(found, 5):
+            members = counter["defense"][1:]
+            r.shuffle(members)
+            defenses.append([leader] + members)
+        defenses.append([leader] + r.sample([f"U{i}" for i in range(30)], 2))
+    defenses.append(["UNKNOWN", "U1"])
+    return defenses
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_exact_same_as_linear_scan(data_dir, seed):
+    data = make_counters(seed)
+    # Few members, so the same defense is stored more than once
+    for found in data.values():
+        for counter in found:
+            counter["defense"] = counter["defense"][:2]
+    write_json(data_dir / "3v3.json", data, 1000)
+    loaded = counters.get_counters("3v3")
+
+    for defense in random_defenses(data, seed):
+        expected = [
+            fields(counter)
+            for counter in data.get(defense[0], [])
+            if sorted(defense) == sorted(counter["defense"])
+        ]
+        found = loaded.exact(counters.defense_signature(defense))
+        assert [fields(counter) for counter in found] == expected
+
+
+def character(base_id: str) -> dict:
+    return {"name": base_id, "base_id": base_id, "categories": [], "image": ""}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_bitmask_filter_same_as_set_filter(data_dir, seed):
+    data = make_counters(seed)
+    write_json(data_dir / "3v3.json", data, 1000)
+    loaded = counters.get_counters("3v3")
+    r = random.Random(seed)
+    for size in (0, 5, 15, 25, 30):
+        # A unit that no counter uses is left out of the mask
+        roster = set(r.sample([f"U{i}" for i in range(30)], size)) | {"UNUSED"}
+        mask = loaded.roster_mask(roster)
+        for leader in data:
+            expected = [
+                fields(counter)
+                for counter in data[leader]
+                if set(counter["attack"]) <= roster
+            ]
+            found = loaded.available(loaded[leader], mask)
+            assert [fields(counter) for counter in found] == expected
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_transform_data_same_as_plain_dict(data_dir, seed):
+    data = make_counters(seed)
+    for found in data.values():
+        for counter in found:
+            counter["defense"] = counter["defense"][:2]
+    write_json(data_dir / "3v3.json", data, 1000)
+    r = random.Random(seed)
+    # transform_data needs the leader of each defense team in the data
+    defenses = [defense for defense in random_defenses(data, seed) if defense[0] in data]
+    gac_round = {
+        "opponent": {
+            zone: [
+                {"defense": [character(base_id) for base_id in defense], "eliminated": False}
+                for defense in defenses[i::3]
+            ]
+            for i, zone in enumerate(("T1", "B1", "B2"))
+        },
+        "player": {"T1": [{"defense": [character("U0"), character("U1")]}]},
+        "used_attack": [[character("U2")]],
+    }
+    player_characters = [character(f"U{i}") for i in r.sample(range(30), 20)]
+
+    # Without the similar counters, the fallback is all counters of the leader
+    options = {
+        "data": gac_round,
+        "player_characters": player_characters,
+        "focus": ["T1", "B1", "B2"],
+        "match_threshold": 1,
+    }
+    expected = main.transform_data(counters_data=data, **options)
+    found = main.transform_data(counters_data=counters.get_counters("3v3"), **options)
+    assert found == expected
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_store_same_as_json(data_dir, seed):
+    data = make_counters(seed)
+    # The names are stored as UTF-8
+    data["L0"][0]["attack"].append("UNIT_É")
+    write_json(data_dir / "3v3.json", data, 1000)
+    write_store(data_dir / "3v3.bin", data, 1000)
+
+    store = CounterStore(str(data_dir / "3v3.bin"))
+    assert list(store) == list(data)
+    assert len(store) == len(data) and "L0" in store and "UNKNOWN" not in store
+    assert {leader: store[leader] for leader in store} == data
+
+    from_json = counters.CounterData("3v3", str(data_dir / "3v3.json"))
+    from_store = counters.CounterData("3v3", str(data_dir / "3v3.bin"))
+    # Only the leaders that are used are decoded from the store
+    assert from_store._leaders == {}
+    r = random.Random(seed)
+    roster = set(r.sample([f"U{i}" for i in range(30)], 20))
+    for defense in random_defenses(data, seed):
+        signature = counters.defense_signature(defense)
+        for loaded in (from_json, from_store):
+            assert (defense[0] in loaded) == (defense[0] in data)
+        assert [fields(c) for c in from_store.exact(signature)] == [
+            fields(c) for c in from_json.exact(signature)
+        ]
+        assert [fields(c) for c in from_store.similar(signature, 10)] == [
+            fields(c) for c in from_json.similar(signature, 10)
+        ]
+        assert [
+            fields(c)
+            for c in from_store.available(
+                from_store.get(defense[0]), from_store.roster_mask(roster)
+            )
+        ] == [
+            fields(c)
+            for c in from_json.available(
+                from_json.get(defense[0]), from_json.roster_mask(roster)
+            )
+        ]
+    assert set(from_store._leaders) == set(data)
+
+
+def brute_force_similar(data: dict, defense: list[str], limit: int, roster=None) -> list:
+    """
+    Score every counter of the leader, the counters that don't share any
+    member are not similar.
+    """
+    leader, members = counters.defense_signature(defense)
+    scored = []
+    for row, counter in enumerate(data.get(leader, [])):
+        if roster is not None and not set(counter["attack"]) <= roster:
+            continue
+        stored = frozenset(counter["defense"])
+        shared = len(members & stored)
+        if not shared:
+            continue
+        seen = counter["seen"]
+        weight = seen / (seen + counters.SEEN_WEIGHT)
+        scored.append((-(shared / len(members | stored) * weight), row))
+    return [fields(data[leader][row]) for _, row in sorted(scored)[:limit]]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_similar_same_as_brute_force(data_dir, seed):
+    data = make_counters(seed, per_leader=60)
+    r = random.Random(seed)
+    for found in data.values():
+        for counter in found:
+            # Defense teams without the leader, and the same seen, so some
+            # counters have the same similarity
+            if r.random() < 0.1:
+                counter["defense"] = counter["defense"][1:]
+            counter["seen"] = r.choice([1, 10, 100])
+    write_json(data_dir / "3v3.json", data, 1000)
+    loaded = counters.get_counters("3v3")
+
+    roster = set(r.sample([f"U{i}" for i in range(30)], 20))
+    for defense in random_defenses(data, seed):
+        signature = counters.defense_signature(defense)
+        for limit in (0, 1, 5, 50, 100):
+            found = loaded.similar(signature, limit)
+            assert [fields(c) for c in found] == brute_force_similar(data, defense, limit)
+            found = loaded.similar(signature, limit, loaded.roster_mask(roster))
+            assert [fields(c) for c in found] == brute_force_similar(
+                data, defense, limit, roster
+            )
@@ -0,0 +1,334 @@
+"""
+The scraper and the API cache against a local fixture site, that serves
+counter pages with ETags, so nothing is sent to swgoh.gg.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from bs4 import BeautifulSoup
+import httpx
+import pytest
+import requests
+
+# The scraper modules are run from the GAC folder, with flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "GAC"))
+
+import benchmark  # noqa: E402
+import endpoints  # noqa: E402
+import scraper  # noqa: E402
+from journal import Journal  # noqa: E402
+
+RATE = 1000
+
+# Saved counter pages, some with cards that are not closed
+PAGES = sorted(
+    glob.glob(os.path.join(os.path.dirname(__file__), "fixtures", "counters", "*.html"))
+)
+
+
+class FixtureSite:
+    """
+    A local site with the counter pages of each leader, and a JSON API
+
+    A leader has 1 to 3 pages of counters, the leaders that start with "E"
+    have none, and the ones that start with "X" are not found. Bumping a
+    leader changes its pages, with tokens each page has a new token in the
+    markup, and each request is logged with its time.
+    """
+
+    def __init__(self):
+        self.version: dict[str, int] = {}
+        self.api: dict[str, object] = {}
+        self.etags = True
+        self.tokens = False
+        self.log: list[tuple[float, str, int]] = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def links(self, leaders: list[str], season: int = 1) -> dict[str, str]:
+        return {
+            leader: f"{self.url}gac/counters/{leader}/?season_id={season}"
+            for leader in leaders
+        }
+
+    def requests(self, leader: str | None = None, status: int | None = None) -> int:
+        return sum(
+            1
+            for _, path, code in self.log
+            if (leader is None or f"/{leader}/" in path)
+            and (status is None or code == status)
+        )
+
+    def page(self, leader: str, page: int) -> str:
+        r = random.Random(f"{leader}-{page}-{self.version.get(leader, 0)}")
+        pages = 1 + sum(map(ord, leader)) % 3
+        cards = []
+        for _ in range(r.randint(3, 8)):
+            links = [
+                f'<a href="/u?s=S&a_{"lead" if i == 0 else "member"}=A{r.randrange(99)}"></a>'
+                for i in range(5)
+            ]
+            links += [f'<a href="/u?s=S&d_member=D{r.randrange(99)}"></a>' for _ in range(4)]
+            cards.append(
+                '<div class="paper paper--size-sm"><div>'
+                + "".join(links)
+                + f'</div><div class="flex-1">Win %{r.randint(10, 100)}%</div>'
+                + f'<div class="flex-1">Avg {r.randint(10, 60)}.{r.randint(0, 9)}</div>'
+                + f'<div class="flex-1">Seen {r.choice(["1,327", "11.3K", "42"])}</div></div>'
+            )
+        nav = ""
+        if page < pages:
+            nav = f'<a class="pagination__link" href="/gac/counters/{leader}/?page={page + 1}">Next</a>'
+        token = f'<meta name="csrf-token" content="{os.urandom(8).hex()}">'
+        head = f"<head>{token}</head>" if self.tokens else ""
+        return f"<html>{head}<body>{''.join(cards)}<div>{nav}</div></body></html>"
+
+    def handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                if parts[0] == "api" and url.path[5:] in site.api:
+                    body = json.dumps(site.api[url.path[5:]])
+                elif parts[:2] == ["gac", "counters"] and not parts[2].startswith("X"):
+                    leader = parts[2]
+                    page = int(parse_qs(url.query).get("page", ["1"])[0])
+                    if leader.startswith("E"):
+                        body = "<html><body><p>No counters</p></body></html>"
+                    else:
+                        body = site.page(leader, page)
+                else:
+                    return self.send(404, b"")
+
+                content = body.encode()
+                etag = f'"{hashlib.md5(content).hexdigest()}"'
+                if site.etags and self.headers.get("If-None-Match") == etag:
+                    return self.send(304, b"", {"ETag": etag})
+                self.send(200, content, {"ETag": etag} if site.etags else {})
+
+            def send(self, status: int, content: bytes, headers: dict | None = None):
+                with site.lock:
+                    site.log.append((time.monotonic(), self.path, status))
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+        return Handler
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def site():
+    site = FixtureSite()
+    yield site
+    site.close()
+
+
+def scrape(site: FixtureSite, links: dict, **options) -> tuple[dict, scraper.Scraper]:
+    """
+    Scrape the links of the fixture site, and return the counters with the
+    scraper for its stats
+    """
+    options = {"rate": RATE, "burst": 1, "site_url": site.url, **options}
+    journal = options.pop("journal", None)
+
+    async def run():
+        async with scraper.Scraper(**options) as s:
+            return await s.scrape(links, journal=journal), s
+
+    return asyncio.run(run())
+
+
+LEADERS = [f"L{i}" for i in range(12)]
+
+
+@pytest.mark.parametrize("path", PAGES, ids=os.path.basename)
+def test_parse_page_same_as_soup(path):
+    leader = os.path.splitext(os.path.basename(path))[0]
+    with open(path, "rb") as f:
+        content = f.read()
+    soup = BeautifulSoup(content, "html.parser")
+    counters, next_url = scraper.parse_page(content, leader)
+    assert counters == scraper.parse_counters(soup, leader)
+    assert next_url == scraper.next_page_url(soup)
+    # No card is dropped, even if the markup is broken
+    assert len(counters) == content.count(b'class="paper paper--size-sm"')
+
+
+def test_benchmark_fixtures():
+    result = benchmark.run(PAGES, repeat=1)
+    assert result["different"] == []
+    assert result["counters"] == 16
+
+
+def test_concurrent_same_as_serial(site):
+    links = site.links(LEADERS)
+    serial, _ = scrape(site, links, concurrency=1)
+    concurrent, _ = scrape(site, links, concurrency=6)
+    assert concurrent == serial
+    assert list(concurrent) == LEADERS
+    assert all(serial[leader] for leader in LEADERS)
+
+
+def test_rate_limit(site):
+    rate = 40
+    scrape(site, site.links(LEADERS), concurrency=8, rate=rate)
+    times = sorted(t for t, _, _ in site.log)
+    # Each request after the first one waits for a token
+    assert times[-1] - times[0] >= (len(times) - 1) / rate * 0.9
+    for i in range(len(times)):
+        window = [t for t in times[i:] if t - times[i] < 0.5]
+        assert len(window) <= 1 + rate * 0.5
+
+
+def test_resume_from_journal(site, tmp_path):
+    links = site.links(LEADERS)
+    expected, _ = scrape(site, links)
+
+    # The site doesn't find one of the leaders, so the run fails
+    broken = {**links, "L6": f"{site.url}gac/counters/X6/"}
+    path = str(tmp_path / "Season_1.jsonl")
+    with pytest.raises(httpx.HTTPStatusError):
+        scrape(site, broken, concurrency=1, journal=Journal(path))
+    done = Journal(path).done()
+    assert done == set(LEADERS[:6])
+
+    # A line that was cut off by a crash
+    with open(path, "a") as f:
+        f.write('{"leader": "L7", "coun')
+
+    site.log.clear()
+    counters, _ = scrape(site, links, concurrency=4, journal=Journal(path))
+    assert counters == expected
+    assert list(counters) == LEADERS
+    assert all(site.requests(leader) == 0 for leader in done)
+    assert all(site.requests(leader) > 0 for leader in LEADERS[6:])
+
+
+def test_unchanged_pages_not_parsed(site, tmp_path, monkeypatch):
+    links = site.links(LEADERS)
+    path = str(tmp_path / "pages.json")
+    cache = scraper.PageCache(path)
+    expected, _ = scrape(site, links, cache=cache)
+    cache.save(set(links.values()))
+    pages = len(cache.pages)
+
+    parsed = []
+    parse_page = scraper.parse_page
+
+    def counting_parse_page(content, leader, site_url):
+        parsed.append(leader)
+        return parse_page(content, leader, site_url)
+
+    monkeypatch.setattr(scraper, "parse_page", counting_parse_page)
+
+    site.log.clear()
+    counters, s = scrape(site, links, cache=scraper.PageCache(path))
+    assert counters == expected
+    assert parsed == []
+    assert s.unchanged == pages
+    assert site.requests(status=304) == pages
+
+    # Without ETags the content hash finds the unchanged pages
+    site.etags = False
+    site.version["L3"] = 1
+    cache = scraper.PageCache(path)
+    counters, s = scrape(site, links, cache=cache)
+    cache.save(set(links.values()))
+    assert set(parsed) == {"L3"}
+    assert counters["L3"] != expected["L3"]
+    assert {leader: counters[leader] for leader in LEADERS if leader != "L3"} == {
+        leader: expected[leader] for leader in LEADERS if leader != "L3"
+    }
+
+    # With a new token in each page, the hash of the counters finds them
+    site.tokens = True
+    expected = counters
+    counters, s = scrape(site, links, cache=scraper.PageCache(path))
+    assert counters == expected
+    assert s.unchanged == pages
+
+
+def test_empty_leader_backoff(site, tmp_path):
+    path = str(tmp_path / "pages.json")
+
+    def checked(season: int) -> int:
+        links = site.links(["L0", "E1"], season=season)
+        cache = scraper.PageCache(path)
+        site.log.clear()
+        counters, _ = scrape(site, links, cache=cache)
+        cache.save(set(links.values()))
+        assert counters["E1"] == []
+        assert counters["L0"]
+        return site.requests("E1")
+
+    # Scraping the same season again, the leader is skipped for 1 run after
+    # it's empty once, then for 2 runs after it's empty twice, then 4
+    assert [checked(1) for _ in range(7)] == [1, 0, 1, 0, 0, 1, 0]
+    # The first scrape of a season is never skipped, then the back-off
+    # continues, 8 runs after it's empty 4 times
+    assert [checked(2) for _ in range(5)] == [1, 0, 0, 0, 0]
+    assert scraper.PageCache(path).leaders["E1"]["empty"] == 4
+    assert scraper.PageCache(path).leaders["L0"]["empty"] == 0
+
+
+def test_get_json_revalidation(site, monkeypatch):
+    monkeypatch.setattr(endpoints, "BASE_URL", f"{site.url}api/")
+    monkeypatch.setattr(endpoints, "CACHE_DIR", None)
+    endpoints.clear_cache()
+    # An endpoint without a TTL is revalidated on each call
+    site.api["units/"] = {"data": [1, 2, 3]}
+    try:
+        assert endpoints.get_json("units/") == {"data": [1, 2, 3]}
+        assert endpoints.get_json("units/") == {"data": [1, 2, 3]}
+        assert site.requests(status=304) == 1
+
+        site.api["units/"] = {"data": [4]}
+        assert endpoints.get_json("units/") == {"data": [4]}
+        assert site.requests(status=200) == 2
+    finally:
+        endpoints.clear_cache()
+
+
+def test_get_json_network_failure(site, monkeypatch):
+    monkeypatch.setattr(endpoints, "BASE_URL", f"{site.url}api/")
+    monkeypatch.setattr(endpoints, "CACHE_DIR", None)
+    endpoints.clear_cache()
+    site.api["units/"] = {"data": [1, 2, 3]}
+    try:
+        assert endpoints.get_json("units/") == {"data": [1, 2, 3]}
+        # The site is down, the expired response is used
+        site.close()
+        assert endpoints.get_json("units/") == {"data": [1, 2, 3]}
+
+        endpoints.clear_cache()
+        with pytest.raises(requests.ConnectionError):
+            endpoints.get_json("units/")
+    finally:
+        endpoints.clear_cache()
@@ -0,0 +1,160 @@
+"""
+The solvers must find the same solution as the serial bitmask search, with
+forward checking, with workers and with the dominance reduction, on random
+seeded boards. The set packing solver can leave a team without a counter,
+so it's checked against a brute force of the best packing instead.
+"""
+
+import copy
+import random
+
+import pytest
+
+from GAC import csp
+
+SEEDS = range(30)
+
+
+def make_board(seed: int, gl: bool = True, duplicates: bool = False) -> dict:
+    """
+    A random board with 3 zones of 3 defense teams, and their counters from
+    a pool of 20 units. With `duplicates`, some counters are repeated with
+    the same or a lower win rate, so the dominance reduction removes them.
+    """
+    r = random.Random(seed)
+    units = {
+        f"U{i}": {"name": f"U{i}", "base_id": f"U{i}", "categories": [], "image": ""}
+        for i in range(20)
+    }
+    pool = list(units)
+    board = {}
+    for zone in ("T1", "B1", "B2"):
+        teams = []
+        for _ in range(3):
+            has_gl = gl and r.random() < 0.2
+            counters = [
+                {
+                    "attack": [units[base_id] for base_id in r.sample(pool, 3)],
+                    "win_rate": round(r.uniform(40, 100), r.choice([0, 2])),
+                    "has_gl": has_gl,
+                }
+                for _ in range(r.randint(0, 8))
+            ]
+            if duplicates:
+                counters += [
+                    {**counter, "win_rate": round(counter["win_rate"] - r.uniform(0, 10), 2)}
+                    for counter in counters
+                    if r.random() < 0.5
+                ]
+                r.shuffle(counters)
+            defense = [units[base_id] for base_id in r.sample(pool, 3)]
+            teams.append({"defense": defense, "counters": counters})
+        board[zone] = teams
+    return board
+
+
+def solve(board: dict, **options) -> tuple[list, int]:
+    """
+    Solve a copy of the board, and return the attack team of each defense
+    team with the total score.
+    """
+    report: dict = {}
+    solution = csp.calculate(copy.deepcopy(board), report=report, **options)
+    teams = sorted(
+        (
+            index,
+            tuple(character["base_id"] for character in team["best_team"]["attack"]),
+            team["best_team"]["win_rate"],
+        )
+        for index, team in solution
+    )
+    return teams, csp.score(report["max_total_win_rate"])
+
+
+def best_packing(board: dict) -> int:
+    """
+    The best total score of the board, where each team gets at most one
+    counter and each unit is used at most once.
+    """
+    teams = [
+        [
+            (csp.score(counter["win_rate"]), {c["base_id"] for c in counter["attack"]})
+            for counter in team["counters"]
+            if not (counter["has_gl"] and counter["win_rate"] < 80)
+        ]
+        for zone in board
+        for team in board[zone]
+    ]
+
+    def search(index: int, used: set) -> int:
+        if index == len(teams):
+            return 0
+        best = search(index + 1, used)
+        for value_score, attack in teams[index]:
+            if not attack & used:
+                best = max(best, value_score + search(index + 1, used | attack))
+        return best
+
+    return search(0, set())
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_bitmask_same_as_csp(seed):
+    # The CSP doesn't check the GL win rate of the first team it assigns
+    board = make_board(seed, gl=False)
+    assert solve(board, solver="bitmask") == solve(board, solver="csp")
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_forward_checking_same_result(seed):
+    board = make_board(seed)
+    assert solve(board, forward_checking=True) == solve(board, forward_checking=False)
+
+
+@pytest.mark.parametrize("seed", SEEDS[:8])
+def test_workers_same_result(seed):
+    board = make_board(seed)
+    assert solve(board, workers=2, split_depth=2) == solve(board)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_exact_dominance_same_result(seed, monkeypatch):
+    board = make_board(seed, duplicates=True)
+    reduced = solve(board, exact=True)
+    monkeypatch.setattr(csp, "reduce_values", lambda values, **_: (values, {}))
+    assert reduced == solve(board)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_packing_finds_best_packing(seed):
+    board = make_board(seed)
+    _, total = solve(board, solver="packing")
+    assert total == best_packing(board)
+    assert total >= solve(board)[1]
+
+
+@pytest.mark.parametrize("seed", SEEDS[:10])
+def test_matching_bound_counter_without_units(seed):
+    # A scraped card can have an empty attack, it uses no unit
+    board = make_board(seed)
+    board["T1"][0]["counters"].append({"attack": [], "win_rate": 55.0, "has_gl": False})
+    board["B1"][1]["counters"].append({"attack": [], "win_rate": 95.0, "has_gl": False})
+    expected = solve(board, bounds=("sum",))
+    assert solve(board, bounds=("matching",)) == expected
+    assert solve(board, bounds=("sum", "matching"), forward_checking=True) == expected
+
+
+@pytest.mark.parametrize(
+    "solver, options",
+    [("csp", {"time_limit": 1}), ("packing", {"progress": print}), ("packing", {"exact": True})],
+)
+def test_unsupported_option(solver, options):
+    with pytest.raises(ValueError, match=f"{solver} solver doesn't support"):
+        csp.calculate(make_board(0), solver=solver, **options)
+
+
+@pytest.mark.parametrize("solver", ["csp", "packing"])
+def test_on_solution_without_iter_solutions(solver):
+    solutions = []
+    solution = csp.calculate(make_board(0), solver=solver, on_solution=solutions.append)
+    assert solutions == [solution]